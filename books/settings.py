@@ -31,6 +31,12 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Process role: 'full' serves everything, 'api' is a trimmed profile for API-only workers
+# without admin, OAuth views, static files and the debug toolbar.
+BOOKS_ROLE = os.environ.get('BOOKS_ROLE', 'full')
+
+API_ONLY = BOOKS_ROLE == 'api'
+
 
 # Application definition
 
@@ -52,6 +58,22 @@ INSTALLED_APPS = [
     'store',
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+
+        'rest_framework',
+        'django_filters',
+
+        # Only for the GitHub backend of sessions created by OAuth logins on the full profile;
+        # its URLs are not mounted.
+        'social_django',
+
+        'store',
+    ]
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -69,6 +91,15 @@ MIDDLEWARE = [
     'debug_toolbar_force.middleware.ForceDebugToolbarMiddleware',
 ]
 
+if API_ONLY:
+    # DRF views are csrf-exempt and enforce CSRF in SessionAuthentication themselves.
+    MIDDLEWARE = [
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    ]
+
 ROOT_URLCONF = 'books.urls'
 
 TEMPLATES = [
@@ -106,9 +137,61 @@ DATABASES = {
 
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.github.GithubOAuth2',
+    'store.authentication.CachedModelBackend',
+    # Sessions keep the path of the backend that logged them in, so password and admin logins made
+    # before CachedModelBackend need this one. Failed password logins are checked by both.
     'django.contrib.auth.backends.ModelBackend',
 )
 
+# A cache shared by all worker processes, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and CACHE_LOCATION=redis://127.0.0.1:6379/1. Without it every process has its own LocMemCache.
+if os.environ.get('CACHE_BACKEND'):
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ['CACHE_BACKEND'],
+            'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+        }
+    }
+
+# Seconds a user fetched for a session or token stays in the per-process cache.
+USER_CACHE_TTL = 30
+
+SIGNED_TOKEN_MAX_AGE = 60 * 60 * 24 * 7
+
+# Byte budget of the per-process book detail cache, see store.cache. 0 disables it.
+BOOK_CACHE_MAX_BYTES = int(os.environ.get('BOOK_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Recompute Book.rating on every relation change. When False, ratings and counters are only
+# updated by `manage.py fold_relation_events`.
+RELATION_AGGREGATES_SYNC = True
+
+# Store relations that carry no like, bookmark or rate when a client touches /book_relation/{id}/.
+# `manage.py compact_relations` deletes the ones already stored.
+PERSIST_EMPTY_RELATIONS = True
+
+# Seconds cached price facets live; price changes invalidate them earlier.
+PRICE_FACETS_TIMEOUT = 60
+PRICE_FACETS_MAX_BUCKETS = 1000
+
+# 'index' answers ?search= from the local index in store.search once `manage.py rebuild_search_index`
+# has built it; 'ilike' keeps the ICONTAINS queries.
+BOOK_SEARCH_BACKEND = os.environ.get('BOOK_SEARCH_BACKEND', 'ilike')
+BOOK_SEARCH_INDEX = os.environ.get('BOOK_SEARCH_INDEX', BASE_DIR / 'var' / 'book_search.idx')
+
+# Request metrics served on /metrics, see store.metrics. With several worker processes METRICS_DIR
+# must be a directory they share; each one writes its counters there every METRICS_FLUSH_INTERVAL seconds
+# and at exit. Run `manage.py clear_metrics` before starting the workers of a deploy.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+# Only REMOTE_ADDR is checked. Behind a reverse proxy on the same host every request comes from
+# 127.0.0.1, so /metrics is public unless the proxy blocks it.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Session reads go through the cache before the session table. That needs the shared cache above, with
+# a per-process one a logout only evicts the session on one worker; the store.E001 check enforces it.
+if os.environ.get('BOOKS_CACHED_SESSIONS') or API_ONLY and os.environ.get('CACHE_BACKEND'):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -152,6 +235,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'store.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
@@ -162,5 +250,8 @@ REST_FRAMEWORK = {
 
 SOCIAL_AUTH_JSONFIELD_ENABLED = True
 
+# Resolves the users of GitHub sessions through the per-process user cache.
+SOCIAL_AUTH_STRATEGY = 'store.authentication.CachedUserStrategy'
+
 SOCIAL_AUTH_GITHUB_KEY = conf.SOCIAL_AUTH_GITHUB_KEY
 SOCIAL_AUTH_GITHUB_SECRET = conf.SOCIAL_AUTH_GITHUB_SECRET
@@ -1,11 +1,9 @@
-from django.contrib import admin
-
+from django.apps import apps
+from django.conf import settings
 from django.urls import path, include, re_path
 from rest_framework.routers import SimpleRouter
 
-from store.views import BookViewSet, auth, UserBookRelationView
-
-from debug_toolbar.toolbar import debug_toolbar_urls
+from store.views import BookViewSet, auth, UserBookRelationView, ObtainTokenView, metrics_view
 
 router = SimpleRouter()
 
@@ -13,10 +11,30 @@ router.register(r'book', BookViewSet)
 router.register(r'book_relation', UserBookRelationView)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('auth/', auth),
-    re_path('', include('social_django.urls', namespace='social'))
-] + debug_toolbar_urls()
+    path('token/', ObtainTokenView.as_view()),
+    path('metrics', metrics_view),
+]
+
+# Admin, OAuth and the debug toolbar are only mounted when their apps are installed,
+# so API-only workers (BOOKS_ROLE=api) never import them. API-only workers install
+# social_django to authenticate OAuth sessions but don't serve the OAuth views.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+    ]
+
+if apps.is_installed('social_django') and not settings.API_ONLY:
+    urlpatterns += [
+        path('auth/', auth),
+        re_path('', include('social_django.urls', namespace='social'))
+    ]
+
+if apps.is_installed('debug_toolbar'):
+    from debug_toolbar.toolbar import debug_toolbar_urls
+
+    urlpatterns += debug_toolbar_urls()
 
 
 urlpatterns += router.urls
@@ -1,6 +1,52 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from store.models import Book, UserBookRelation
 
-admin.site.register(Book)
-admin.site.register(UserBookRelation)
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On Postgres, takes the table's row estimate from pg_class instead of running COUNT(*) when it is
+    large enough that an exact figure doesn't matter for paging. Filtered and searched lists are counted
+    exactly, since their size can be orders of magnitude off any estimate.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return super().count
+
+        # A partitioned table has no rows of its own; its partitions do.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0) FROM pg_class WHERE oid = %s::regclass '
+                'OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)',
+                [queryset.model._meta.db_table] * 2,
+            )
+            estimate = int(cursor.fetchone()[0])
+        return estimate if estimate >= self.estimate_threshold else super().count
+
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'author', 'price', 'rating', 'owner')
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner',)
+    search_fields = ('name', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(UserBookRelation)
+class UserBookRelationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'book', 'like', 'in_bookmarks', 'rate')
+    list_select_related = ('user', 'book')
+    list_filter = ('like', 'in_bookmarks', 'rate')
+    raw_id_fields = ('user', 'book')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,113 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.checks import Error, Tags, register
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from social_django.strategy import DjangoStrategy
+
+TOKEN_SALT = 'store.authentication.token'
+
+# Cache backends that keep their entries inside the worker process.
+PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_users = {}
+
+
+def get_cached_user(user_id):
+    """
+    Returns the user with ``user_id`` from a short-lived per-process cache, or None if it doesn't exist.
+    """
+    entry = _users.get(user_id)
+    now = time.monotonic()
+    if entry is None or entry[0] < now:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        entry = _users[user_id] = (now + settings.USER_CACHE_TTL, user)
+    return copy.copy(entry[1])
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    _users.pop(instance.pk, None)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that resolves the session user through the per-process user cache.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(int(user_id))
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class CachedUserStrategy(DjangoStrategy):
+    """
+    DjangoStrategy that resolves the users of GitHub sessions through the per-process user cache.
+    """
+
+    def get_user(self, user_id):
+        return get_cached_user(int(user_id))
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """
+    Cached sessions must live in a cache shared by all workers: with a per-process cache a logout only
+    evicts the session from the worker that handled it, the others accept it until their copy expires.
+    """
+    if not settings.SESSION_ENGINE.startswith('django.contrib.sessions.backends.cache'):
+        return []
+    backend = settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']
+    if backend not in PROCESS_CACHES:
+        return []
+    return [Error(
+        f'{settings.SESSION_ENGINE} sessions need a cache shared by all workers, not {backend}.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a Redis or Memcached server.',
+        id='store.E001',
+    )]
+
+
+def create_token(user):
+    return signing.dumps({'id': user.pk, 'hash': user.get_session_auth_hash()}, salt=TOKEN_SALT)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Stateless ``Authorization: Token <token>`` authentication. Tokens are signed, expire after
+    SIGNED_TOKEN_MAX_AGE seconds and stop working when the user's password changes.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            payload = signing.loads(auth[1].decode(), salt=TOKEN_SALT, max_age=settings.SIGNED_TOKEN_MAX_AGE)
+        except (signing.BadSignature, UnicodeError):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        user = get_cached_user(payload['id'])
+        if user is None or not user.is_active or not constant_time_compare(payload['hash'],
+                                                                           user.get_session_auth_hash()):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return user, None
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,209 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils.http import urlencode
+
+from store.models import Book, BookVersion, UserBookRelation
+from store.serializers import BookSerializer, BookReaderSerializer
+
+FIELDS = BookSerializer.Meta.fields
+READER_FIELDS = BookReaderSerializer.Meta.fields
+
+
+class CachedBook:
+    __slots__ = ('version', 'values', 'size')
+
+    def __init__(self, version, values):
+        self.version = version
+        self.values = values
+        self.size = _sizeof(values)
+
+    def payload(self):
+        data = dict(zip(FIELDS, self.values))
+        data['readers'] = [dict(zip(READER_FIELDS, reader)) for reader in data['readers']]
+        return data
+
+
+def _sizeof(value):
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class BookCache:
+    """
+    Per-process LRU of serialized book detail payloads, bounded by an estimate of their size in bytes.
+
+    Entries are stored as plain tuples and remember the BookVersion they were built from; every hit is
+    checked against the current version, so changes made by other processes are never served.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, book_id):
+        entry = self.entries.get(book_id)
+        if entry is not None and entry.version != get_version(book_id):
+            self.invalidate(book_id)
+            entry = None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if book_id in self.entries:
+                self.entries.move_to_end(book_id)
+        return entry.payload()
+
+    def put(self, book_id, version, data):
+        readers = tuple(tuple(reader[name] for name in READER_FIELDS) for reader in data['readers'])
+        entry = CachedBook(version, tuple(readers if name == 'readers' else data[name] for name in FIELDS))
+        if entry.size > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(book_id)
+            self.entries[book_id] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, book_id):
+        with self.lock:
+            if self._remove(book_id):
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def _remove(self, book_id):
+        entry = self.entries.pop(book_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+book_cache = BookCache(settings.BOOK_CACHE_MAX_BYTES)
+
+
+def get_version(book_id):
+    return BookVersion.objects.filter(book_id=book_id).values_list('version', flat=True).first()
+
+
+def create_version(book_id):
+    """
+    Creates the version row of an existing book that has none and returns its version. Call it only
+    after the book was read: deleting a book deletes its row, so rows of missing ids would never go away.
+
+    Changes create a missing row at version 1, so anything but 0 means the book changed since it was read.
+    """
+    BookVersion.objects.bulk_create([BookVersion(book_id=book_id)], ignore_conflicts=True)
+    return get_version(book_id)
+
+
+def bump_version(book_id):
+    book_cache.invalidate(book_id)
+    if not BookVersion.objects.filter(book_id=book_id).update(version=F('version') + 1):
+        BookVersion.objects.get_or_create(book_id=book_id, defaults={'version': 1})
+
+
+def bump_versions(book_ids):
+    book_ids = list(book_ids)
+    BookVersion.objects.filter(book_id__in=book_ids).update(version=F('version') + 1)
+    BookVersion.objects.bulk_create([BookVersion(book_id=book_id, version=1) for book_id in book_ids],
+                                    ignore_conflicts=True)
+
+
+@receiver(post_save, sender=Book)
+def invalidate_book(sender, instance, update_fields=None, **kwargs):
+    bump_version(instance.pk)
+    if update_fields is None or 'price' in update_fields:
+        bump_price_facets()
+
+
+@receiver(post_delete, sender=Book)
+def forget_book(sender, instance, **kwargs):
+    book_cache.invalidate(instance.pk)
+    BookVersion.objects.filter(book_id=instance.pk).delete()
+    bump_price_facets()
+
+
+# User fields shown in book payloads, as owner_name and as readers.
+USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def user_book_ids(user):
+    owned = Book.objects.filter(owner=user).values_list('id', flat=True)
+    related = UserBookRelation.objects.filter(user=user).values_list('book_id', flat=True)
+    return set(owned) | set(related)
+
+
+# Relation saves bump their book in UserBookRelation.save(), once per save, and relations deleted with
+# their book need nothing more. A user's books change when the user is renamed, or deleted: that nulls
+# Book.owner with a bulk UPDATE and cascades the relations, neither of which sends Book signals.
+@receiver(post_save, sender=User)
+def invalidate_user_books(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields is not None and not USER_FIELDS & set(update_fields):
+        return
+    bump_versions(user_book_ids(instance))
+
+
+@receiver(pre_delete, sender=User)
+def forget_user_books(sender, instance, **kwargs):
+    bump_versions(user_book_ids(instance))
+
+
+PRICE_FACETS_VERSION = 'store:price_facets:version'
+
+
+def cached_price_facets(params, compute):
+    """
+    Returns the price facets for the query ``params`` from the Django cache, calling ``compute`` on a miss.
+
+    Keys embed a version that Book price changes bump. With a shared CACHES backend this invalidates
+    every process; with the default local-memory cache PRICE_FACETS_TIMEOUT bounds staleness.
+    """
+    version = cache.get_or_set(PRICE_FACETS_VERSION, 0, None)
+    key = f'store:price_facets:{version}:{urlencode(sorted(params.lists()), doseq=True)}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute()
+        cache.set(key, facets, settings.PRICE_FACETS_TIMEOUT)
+    return facets
+
+
+def bump_price_facets():
+    try:
+        cache.incr(PRICE_FACETS_VERSION)
+    except ValueError:
+        cache.set(PRICE_FACETS_VERSION, 1, None)
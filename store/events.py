@@ -0,0 +1,139 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, Case, When, DecimalField, FloatField, ExpressionWrapper
+from django.db.models.functions import Cast
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from store.cache import bump_versions
+from store.models import Book, BookVersion, UserBookRelation, RelationEvent
+
+
+def relation_events(relation, old_like, old_bookmarks, old_rate):
+    """
+    Returns the unsaved events that take a relation from the old state to its current one.
+    """
+    events = []
+    if relation.like != old_like:
+        events.append(RelationEvent.LIKE if relation.like else RelationEvent.UNLIKE)
+    if relation.in_bookmarks != old_bookmarks:
+        events.append(RelationEvent.BOOKMARK if relation.in_bookmarks else RelationEvent.UNBOOKMARK)
+    events = [RelationEvent(user_id=relation.user_id, book_id=relation.book_id, kind=kind) for kind in events]
+    if relation.rate != old_rate:
+        events.append(RelationEvent(user_id=relation.user_id, book_id=relation.book_id, kind=RelationEvent.RATE,
+                                    old_rate=old_rate, rate=relation.rate))
+    return events
+
+
+def record_deleted_relations(column, value):
+    """
+    Writes the events that undo every relation with ``column = value`` with one INSERT ... SELECT,
+    so a cascade doesn't have to load the relations it removes to log them.
+    """
+    quote = connection.ops.quote_name
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    selects = []
+    params = []
+    for kind, condition, condition_params, old_rate in (
+        (RelationEvent.UNLIKE, f'{quote("like")} = %s', [True], 'NULL'),
+        (RelationEvent.UNBOOKMARK, f'{quote("in_bookmarks")} = %s', [True], 'NULL'),
+        (RelationEvent.RATE, 'rate IS NOT NULL', [], 'rate'),
+    ):
+        selects.append(f'SELECT user_id, book_id, %s, CAST({old_rate} AS integer), CAST(NULL AS integer), %s, %s '
+                       f'FROM {quote(UserBookRelation._meta.db_table)} WHERE {quote(column)} = %s AND {condition}')
+        params += [kind, created, False, value, *condition_params]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(RelationEvent._meta.db_table)} '
+            f'(user_id, book_id, kind, old_rate, rate, created, folded) {" UNION ALL ".join(selects)}',
+            params,
+        )
+
+
+@receiver(pre_delete, sender=Book)
+def record_deleted_book_relations(sender, instance, **kwargs):
+    record_deleted_relations('book_id', instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def record_deleted_user_relations(sender, instance, **kwargs):
+    record_deleted_relations('user_id', instance.pk)
+
+
+def fold_relation_events(batch_size=5000, progress=None):
+    """
+    Applies unfolded relation events to the Book counters and rating, one batch per transaction.
+
+    A batch is marked folded in the same transaction that updates the books, so every event is folded
+    exactly once. Events of transactions still open are not visible yet and are picked up by a later run,
+    whatever their ids. Concurrent runs skip the events another run has locked. Returns the number of
+    folded events.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            events = list(RelationEvent.objects.select_for_update(skip_locked=True).filter(
+                folded=False
+            ).order_by('id').values_list('id', 'book_id', 'kind', 'old_rate', 'rate')[:batch_size])
+            if not events:
+                return folded
+
+            apply_deltas(event_deltas(events))
+            RelationEvent.objects.filter(id__in=[event[0] for event in events]).update(folded=True)
+        folded += len(events)
+        if progress:
+            progress(folded, events[-1][0])
+
+
+def event_deltas(events):
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for _, book_id, kind, old_rate, rate in events:
+        delta = deltas[book_id]
+        if kind == RelationEvent.LIKE:
+            delta[0] += 1
+        elif kind == RelationEvent.UNLIKE:
+            delta[0] -= 1
+        elif kind == RelationEvent.BOOKMARK:
+            delta[1] += 1
+        elif kind == RelationEvent.UNBOOKMARK:
+            delta[1] -= 1
+        else:
+            delta[2] += (rate or 0) - (old_rate or 0)
+            delta[3] += (rate is not None) - (old_rate is not None)
+    return deltas
+
+
+def apply_deltas(deltas):
+    books = defaultdict(list)
+    for book_id, delta in deltas.items():
+        books[tuple(delta)].append(book_id)
+
+    for (likes, bookmarks, rate_total, rate_count), book_ids in books.items():
+        Book.objects.filter(id__in=book_ids).update(
+            likes_count=F('likes_count') + likes,
+            bookmarks_count=F('bookmarks_count') + bookmarks,
+            rate_total=F('rate_total') + rate_total,
+            rate_count=F('rate_count') + rate_count,
+        )
+    Book.objects.filter(id__in=list(deltas)).update(rating=Case(
+        When(rate_count=0, then=None),
+        default=ExpressionWrapper(
+            Cast('rate_total', FloatField()) / F('rate_count'),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    ))
+    bump_versions(deltas)
+
+
+def replay_relation_events(batch_size=5000, progress=None):
+    """
+    Rebuilds all Book counters and ratings from the event log alone, in log order.
+    """
+    with transaction.atomic():
+        Book.objects.update(likes_count=0, bookmarks_count=0, rate_total=0, rate_count=0, rating=None)
+        RelationEvent.objects.filter(folded=True).update(folded=False)
+        BookVersion.objects.update(version=F('version') + 1)
+        return fold_relation_events(batch_size=batch_size, progress=progress)
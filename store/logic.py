@@ -1,9 +1,131 @@
-from django.db.models import Avg
+from django.db import OperationalError, connection, transaction
+from django.db.models import Avg, Max, Min
 
-from store.models import UserBookRelation
+from store.cache import bump_versions
+from store.metrics import timer
+from store.models import Book, UserBookRelation, RelationEvent
+
+# Attempts of a recompute chunk that Postgres aborts because a concurrent write touched its books.
+SERIALIZATION_ATTEMPTS = 5
 
 
 def set_rating(book):
-    rating = UserBookRelation.objects.filter(book=book).aggregate(rating=Avg('rate')).get('rating')
-    book.rating = rating
-    book.save()
+    with timer('set_rating'):
+        rating = UserBookRelation.objects.filter(book=book).aggregate(rating=Avg('rate')).get('rating')
+        book.rating = rating
+        book.save(update_fields=['rating'])
+
+
+def update_book_aggregates(low, high):
+    """
+    Sets the rating and counters of books with ``low <= id <= high`` with one UPDATE ... FROM a derived
+    table that groups their relations once. Returns the number of updated books.
+    """
+    quote = connection.ops.quote_name
+    book = quote(Book._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {book} SET rating = aggregates.rating, likes_count = aggregates.likes_count, '
+            f'bookmarks_count = aggregates.bookmarks_count, rate_total = aggregates.rate_total, '
+            f'rate_count = aggregates.rate_count '
+            f'FROM (SELECT b.id AS book_id, AVG(r.rate) AS rating, '
+            f'COUNT(CASE WHEN r.{quote("like")} = %s THEN 1 END) AS likes_count, '
+            f'COUNT(CASE WHEN r.in_bookmarks = %s THEN 1 END) AS bookmarks_count, '
+            f'COALESCE(SUM(r.rate), 0) AS rate_total, COUNT(r.rate) AS rate_count '
+            f'FROM {book} b LEFT JOIN {quote(UserBookRelation._meta.db_table)} r ON r.book_id = b.id '
+            f'WHERE b.id BETWEEN %s AND %s GROUP BY b.id) aggregates '
+            f'WHERE {book}.id = aggregates.book_id',
+            [True, True, low, high],
+        )
+        return cursor.rowcount
+
+
+def recompute_ratings(start_id=None, end_id=None, chunk_size=1000, partition=0, partitions=1, progress=None):
+    """
+    Recomputes ``Book.rating`` and the like, bookmark and rate counters for books with
+    ``start_id <= id <= end_id`` from their relations, with one grouped UPDATE per chunk of ids
+    (see ``update_book_aggregates``).
+
+    The chunk's unfolded relation events are marked folded in the same transaction, as the relations
+    already reflect them; on Postgres it runs at REPEATABLE READ so both statements see the same rows,
+    and is retried when a concurrent ``set_rating`` or fold makes it fail to serialize.
+    Chunks are aligned to multiples of ``chunk_size``; chunk ``n`` belongs to partition ``n % partitions``,
+    so workers with the same ``chunk_size`` never overlap. ``progress(low, high, updated)`` is called
+    after every chunk. Returns the number of updated books.
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive.')
+    bounds = Book.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if bounds['min_id'] is None:
+        return 0
+    start_id = max(start_id or bounds['min_id'], bounds['min_id'])
+    end_id = min(end_id or bounds['max_id'], bounds['max_id'])
+
+    total = 0
+    for chunk in range(start_id // chunk_size, end_id // chunk_size + 1):
+        if chunk % partitions != partition:
+            continue
+        low = max(chunk * chunk_size, start_id)
+        high = min((chunk + 1) * chunk_size - 1, end_id)
+        outermost = transaction.get_autocommit()
+        for attempt in range(1, SERIALIZATION_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    if outermost and connection.vendor == 'postgresql':
+                        with connection.cursor() as cursor:
+                            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                    RelationEvent.objects.filter(book_id__gte=low, book_id__lte=high, folded=False).update(
+                        folded=True
+                    )
+                    updated = update_book_aggregates(low, high)
+                    bump_versions(Book.objects.filter(id__gte=low, id__lte=high).values_list('id', flat=True))
+                break
+            except OperationalError as error:
+                # Inside an outer transaction the whole transaction is lost, not just the chunk.
+                if not outermost or not is_serialization_failure(error) or attempt == SERIALIZATION_ATTEMPTS:
+                    raise
+        total += updated
+        if progress:
+            progress(low, high, updated)
+    return total
+
+
+def is_serialization_failure(error):
+    # SQLSTATE 40001, exposed as pgcode by psycopg2 and as sqlstate by psycopg 3.
+    cause = error.__cause__
+    return (getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)) == '40001'
+
+
+def delete_without_signals(queryset):
+    """
+    Deletes ``queryset`` with one DELETE, without collecting the rows or sending delete signals.
+    Only for rows nothing cascades from and whose deletion needs no events, like empty relations.
+    """
+    # QuerySet._raw_delete is private API; it is the statement Django's own fast delete runs.
+    return queryset._raw_delete(queryset.db)
+
+
+def compact_relations(batch_size=10000, max_id=None, progress=None):
+    """
+    Deletes relations without like, bookmark or rate in batches of ``batch_size`` rows.
+
+    They carry no information, so no events are written; the affected books' cached payloads are
+    invalidated because their readers change. Returns the number of deleted relations.
+    """
+    empty = UserBookRelation.objects.filter(like=False, in_bookmarks=False, rate__isnull=True)
+    if max_id is not None:
+        empty = empty.filter(id__lte=max_id)
+
+    deleted = 0
+    last_id = 0
+    while True:
+        batch = list(empty.filter(id__gt=last_id).order_by('id').values_list('id', 'book_id')[:batch_size])
+        if not batch:
+            return deleted
+        last_id = batch[-1][0]
+        with transaction.atomic():
+            count = delete_without_signals(empty.filter(id__in=[relation_id for relation_id, _ in batch]))
+            bump_versions({book_id for _, book_id in batch})
+        deleted += count
+        if progress:
+            progress(deleted, last_id)
@@ -0,0 +1,56 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from store.cache import book_cache
+from store.models import Book
+
+
+class Command(BaseCommand):
+    help = ('Compares GET /book/{id}/ latency with the book detail cache disabled and enabled. Run it with '
+            'BOOKS_ROLE=api; under the full profile the debug toolbar dominates both timings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000, help='Distinct books to read.')
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not settings.API_ONLY:
+            raise CommandError('Run bench_book_cache with BOOKS_ROLE=api, the debug toolbar of the full profile '
+                               'hides the difference.')
+        book_ids = list(Book.objects.order_by('id').values_list('id', flat=True)[:options['books']])
+        if not book_ids:
+            raise CommandError('There are no books to read.')
+
+        # Zipf-like skew: the n-th book is read 1/n as often as the first one.
+        reads = random.Random(options['seed']).choices(
+            book_ids, weights=[1 / rank for rank in range(1, len(book_ids) + 1)], k=options['requests']
+        )
+        max_bytes = book_cache.max_bytes or 32 * 1024 * 1024
+        client = Client(HTTP_HOST='localhost')
+
+        self.stdout.write(f'{"cache":<9} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9} {"req/s":>9}')
+        for label, budget in (('disabled', 0), ('enabled', max_bytes)):
+            book_cache.max_bytes = budget
+            book_cache.clear()
+            latencies = []
+            for book_id in reads:
+                start = time.perf_counter()
+                client.get(f'/book/{book_id}/')
+                latencies.append(time.perf_counter() - start)
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'{label:<9} {quantiles[49] * 1e6:>9.0f} {quantiles[94] * 1e6:>9.0f} {quantiles[98] * 1e6:>9.0f} '
+                f'{len(latencies) / sum(latencies):>9.0f}'
+            )
+
+        stats = book_cache.stats()
+        self.stdout.write(
+            f'hit ratio {stats["hit_ratio"]:.1%}, {stats["entries"]} entries, '
+            f'{stats["bytes"] / 1024:.0f} of {stats["max_bytes"] / 1024:.0f} KiB, {stats["evictions"]} evictions'
+        )
@@ -0,0 +1,67 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter per role: times django.setup() plus WSGI handler construction,
+# then pushes requests through the full middleware stack. OPTIONS /book/ touches no tables,
+# so the numbers are the per-request framework and middleware overhead.
+CHILD = '''
+import json, sys, time
+
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+startup = time.perf_counter() - start
+
+from django.test import Client
+
+client = Client(HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+client.options('/book/')
+count = int(sys.argv[1])
+start = time.perf_counter()
+for _ in range(count):
+    client.options('/book/')
+per_request = (time.perf_counter() - start) / count
+
+from django.conf import settings
+print(json.dumps({
+    'startup': startup,
+    'per_request': per_request,
+    'modules': len(sys.modules),
+    'apps': len(settings.INSTALLED_APPS),
+    'middleware': len(settings.MIDDLEWARE),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compares startup time and per-request middleware overhead of the BOOKS_ROLE profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--roles', nargs='+', default=['full', 'api'])
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per role.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests timed per process.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"role":<6} {"startup ms":>11} {"request us":>11} {"modules":>8} {"apps":>5} {"mw":>4}')
+        for role in options['roles']:
+            runs = [self.run_child(role, options['requests']) for _ in range(options['repeat'])]
+            startup = statistics.median(run['startup'] for run in runs) * 1000
+            per_request = statistics.median(run['per_request'] for run in runs) * 1000000
+            self.stdout.write(
+                f'{role:<6} {startup:>11.1f} {per_request:>11.1f} {runs[0]["modules"]:>8} '
+                f'{runs[0]["apps"]:>5} {runs[0]["middleware"]:>4}'
+            )
+
+    def run_child(self, role, requests):
+        env = dict(os.environ, BOOKS_ROLE=role)
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD, str(requests)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
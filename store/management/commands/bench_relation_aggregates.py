@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Case, When, Avg
+
+from store.logic import delete_without_signals
+from store.models import Book, UserBookRelation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Times the relation aggregates behind the book API. With --compare-compacted the same queries are '
+            'timed again after deleting empty relations inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--books', type=int, default=100, help='Books in the readers prefetch.')
+        parser.add_argument('--compare-compacted', action='store_true')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"":<10} {"relations":>10} {"empty":>9} {"likes ms":>9} {"rating ms":>10} '
+                          f'{"readers ms":>11}')
+        self.measure('current', options)
+        if not options['compare_compacted']:
+            return
+        try:
+            with transaction.atomic():
+                delete_without_signals(UserBookRelation.objects.filter(like=False, in_bookmarks=False,
+                                                                       rate__isnull=True))
+                self.measure('compacted', options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, label, options):
+        relations = UserBookRelation.objects.count()
+        empty = UserBookRelation.objects.filter(like=False, in_bookmarks=False, rate__isnull=True).count()
+        likes = self.time(options['repeat'], lambda: list(Book.objects.annotate(
+            annotated_likes=Count(Case(When(userbookrelation__like=True, then=1)))
+        ).values_list('id', 'annotated_likes')))
+        rating = self.time(options['repeat'], lambda: list(
+            UserBookRelation.objects.values('book').annotate(rating=Avg('rate')).values_list('book', 'rating')
+        ))
+        books = Book.objects.prefetch_related('readers').order_by('id')[:options['books']]
+        readers = self.time(options['repeat'], lambda: [list(book.readers.all()) for book in books.all()])
+        self.stdout.write(f'{label:<10} {relations:>10} {empty:>9} {likes:>9.1f} {rating:>10.1f} {readers:>11.1f}')
+
+    def time(self, repeat, query):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
@@ -0,0 +1,53 @@
+import random
+import statistics
+import time
+from functools import reduce
+from operator import and_
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from store.models import Book
+from store.search import get_index, tokenize
+
+
+class Command(BaseCommand):
+    help = ('Compares ?search= latency of the ICONTAINS queries with the local search index. Terms are '
+            'words sampled from book names and authors.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--words', type=int, default=1, help='Words per query.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        index = get_index()
+        if not index.refresh():
+            raise CommandError('There is no search index, run rebuild_search_index first.')
+
+        words = [word for name, author in Book.objects.order_by('id').values_list('name', 'author')[:1000]
+                 for word in tokenize(f'{name} {author}')]
+        if not words:
+            raise CommandError('There are no books to search.')
+        rand = random.Random(options['seed'])
+        queries = [rand.sample(words, min(options['words'], len(words))) for _ in range(options['queries'])]
+
+        def ilike(terms):
+            return list(Book.objects.filter(reduce(and_, (
+                Q(name__icontains=term) | Q(author__icontains=term) for term in terms
+            ))).values_list('id', flat=True))
+
+        def indexed(terms):
+            return list(Book.objects.filter(id__in=index.search(terms)).values_list('id', flat=True))
+
+        self.stdout.write(f'{"backend":<8} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9} {"matches":>9}')
+        for label, search in (('ilike', ilike), ('index', indexed)):
+            latencies = []
+            matches = 0
+            for terms in queries:
+                start = time.perf_counter()
+                matches += len(search(terms))
+                latencies.append(time.perf_counter() - start)
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(f'{label:<8} {quantiles[49] * 1e6:>9.0f} {quantiles[94] * 1e6:>9.0f} '
+                              f'{quantiles[98] * 1e6:>9.0f} {matches:>9}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.recommendations import build_similarities
+
+
+class Command(BaseCommand):
+    help = 'Precomputes "readers also liked" neighbours of every book from the like graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Books per sparse matrix product.')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only rebuild books affected by relations changed since the last build.')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError('build_similar_books requires numpy and scipy.')
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} books')
+
+        books = build_similarities(top_k=options['top_k'], chunk_size=options['chunk_size'],
+                                   incremental=options['incremental'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'{books} books rebuilt'))
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Deletes the metrics files of all workers from METRICS_DIR, which resets the counters. '
+            'Run it before starting the workers of a deploy.')
+
+    def handle(self, *args, **options):
+        if not settings.METRICS_DIR:
+            raise CommandError('METRICS_DIR is not set.')
+        paths = [*Path(settings.METRICS_DIR).glob('*.json'), *Path(settings.METRICS_DIR).glob('*.json.tmp')]
+        for path in paths:
+            path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f'{len(paths)} metrics files deleted from {settings.METRICS_DIR}'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.logic import compact_relations
+
+
+class Command(BaseCommand):
+    help = 'Deletes relations that have no like, bookmark or rate, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--max-id', type=int, help='Leave relations with a higher id alone.')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches.')
+
+    def handle(self, *args, **options):
+        def progress(deleted, last_id):
+            self.stdout.write(f'{deleted} relations deleted, up to id {last_id}')
+            time.sleep(options['sleep'])
+
+        deleted = compact_relations(batch_size=options['batch_size'], max_id=options['max_id'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} relations deleted'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.events import fold_relation_events
+
+
+class Command(BaseCommand):
+    help = 'Folds new relation events into Book counters and ratings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--interval', type=float, help='Keep running as a worker, polling every N seconds.')
+
+    def handle(self, *args, **options):
+        def progress(folded, position):
+            self.stdout.write(f'{folded} events folded, up to event {position}')
+
+        while True:
+            folded = fold_relation_events(batch_size=options['batch_size'], progress=progress)
+            if options['interval'] is None:
+                self.stdout.write(self.style.SUCCESS(f'{folded} events folded'))
+                return
+            time.sleep(options['interval'])
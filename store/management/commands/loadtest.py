@@ -0,0 +1,214 @@
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from store.authentication import create_token
+from store.models import Book
+
+DEFAULT_MIX = 'list=50,detail=30,like=8,rate=7,create=5'
+
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+SEARCH_TERMS = ('Author', 'Book', 'Python', 'a', 'Test')
+ORDERINGS = ('price', '-price', 'author', '-author')
+
+
+def parse_mix(value):
+    try:
+        mix = {name: float(weight) for name, weight in (part.split('=') for part in value.split(','))}
+    except ValueError:
+        raise CommandError(f'Invalid --mix {value!r}, expected name=weight pairs.')
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise CommandError(f'Unknown operations in --mix: {", ".join(sorted(unknown))}.')
+    if not all(0 <= weight < float('inf') for weight in mix.values()) or not sum(mix.values()):
+        raise CommandError(f'Invalid --mix {value!r}, weights must be finite, not negative and not all zero.')
+    return mix
+
+
+def list_books(rng, book_ids):
+    params = {}
+    if rng.random() < 0.3:
+        params['search'] = rng.choice(SEARCH_TERMS)
+    if rng.random() < 0.3:
+        params['price__gte'] = rng.randrange(0, 100)
+    if rng.random() < 0.3:
+        params['ordering'] = rng.choice(ORDERINGS)
+    return 'GET', '/book/', params, None
+
+
+def retrieve_book(rng, book_ids):
+    return 'GET', f'/book/{rng.choice(book_ids)}/', {}, None
+
+
+def like_book(rng, book_ids):
+    return 'PATCH', f'/book_relation/{rng.choice(book_ids)}/', {}, {'like': rng.random() < 0.5}
+
+
+def rate_book(rng, book_ids):
+    return 'PATCH', f'/book_relation/{rng.choice(book_ids)}/', {}, {'rate': rng.randint(1, 5)}
+
+
+def create_book(rng, book_ids):
+    return 'POST', '/book/', {}, {'name': f'loadtest {rng.getrandbits(32):08x}',
+                                  'price': f'{rng.uniform(1, 100):.2f}', 'author': 'loadtest'}
+
+
+OPERATIONS = {
+    'list': list_books,
+    'detail': retrieve_book,
+    'like': like_book,
+    'rate': rate_book,
+    'create': create_book,
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.queries = 0
+        self.db_time = 0.0
+
+    def merge(self, other):
+        self.latencies += other.latencies
+        self.errors += other.errors
+        self.queries += other.queries
+        self.db_time += other.db_time
+
+
+class Command(BaseCommand):
+    help = ('Replays a mixed workload of book list, detail, like, rate and create requests and reports '
+            'throughput, latency histograms, errors and DB queries per endpoint. '
+            'Writes go to the configured database (or the --url server).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server; the Django test client is used if omitted.')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights, default {DEFAULT_MIX}.')
+        parser.add_argument('--username', default='loadtest', help='User the writes are made as; created if missing.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        book_ids = list(Book.objects.order_by('id').values_list('id', flat=True)[:1000])
+        if not book_ids:
+            raise CommandError('There are no books to replay requests against.')
+        user, _ = User.objects.get_or_create(username=options['username'])
+        self.token = create_token(user)
+        self.url = options['url']
+
+        rng = random.Random(options['seed'])
+        names = list(mix)
+        plan = [OPERATIONS[name](rng, book_ids) + (name,)
+                for name in rng.choices(names, weights=[mix[name] for name in names], k=options['requests'])]
+        shares = [plan[worker::options['concurrency']] for worker in range(options['concurrency'])]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(self.run_worker, shares))
+        elapsed = time.perf_counter() - start
+
+        stats = {name: EndpointStats() for name in names}
+        for result in results:
+            for name, endpoint in result.items():
+                stats[name].merge(endpoint)
+        self.report(stats, elapsed)
+
+    def run_worker(self, plan):
+        stats = {}
+        counter = QueryCounter()
+        # A view that raises is answered with a 500 and counted, instead of ending the run.
+        client = None if self.url else Client(raise_request_exception=False, HTTP_HOST='localhost')
+        try:
+            with connection.execute_wrapper(counter):
+                for method, path, params, body, name in plan:
+                    endpoint = stats.setdefault(name, EndpointStats())
+                    queries, db_time = counter.count, counter.time
+                    start = time.perf_counter()
+                    try:
+                        status = self.send(client, method, path, params, body)
+                    except (OSError, urllib.error.URLError):
+                        status = None
+                    endpoint.latencies.append(time.perf_counter() - start)
+                    endpoint.queries += counter.count - queries
+                    endpoint.db_time += counter.time - db_time
+                    if status is None or status >= 400:
+                        endpoint.errors += 1
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        return stats
+
+    def send(self, client, method, path, params, body):
+        query = f'?{urlencode(params)}' if params else ''
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token}'} if body is not None else {}
+        data = json.dumps(body) if body is not None else ''
+        if client is not None:
+            return client.generic(method, path + query, data, content_type='application/json', **headers).status_code
+
+        request = urllib.request.Request(
+            self.url.rstrip('/') + path + query, data=data.encode() if body is not None else None, method=method,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json',
+                     **({'Authorization': headers['HTTP_AUTHORIZATION']} if headers else {})},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def report(self, stats, elapsed):
+        total = sum(len(endpoint.latencies) for endpoint in stats.values())
+        self.stdout.write(f'{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s')
+        self.stdout.write(f'{"endpoint":<8} {"count":>6} {"errors":>6} {"req/s":>7} {"p50 ms":>7} {"p95 ms":>7} '
+                          f'{"p99 ms":>7} {"queries":>8} {"q/req":>6} {"db ms":>8}')
+        for name, endpoint in stats.items():
+            count = len(endpoint.latencies)
+            if not count:
+                continue
+            latencies = sorted(endpoint.latencies)
+            quantiles = statistics.quantiles(latencies, n=100) if count > 1 else latencies * 99
+            queries = f'{endpoint.queries:>8} {endpoint.queries / count:>6.1f} {endpoint.db_time * 1000:>8.1f}' \
+                if not self.url else f'{"n/a":>8} {"n/a":>6} {"n/a":>8}'
+            self.stdout.write(
+                f'{name:<8} {count:>6} {endpoint.errors:>6} {count / elapsed:>7.1f} {quantiles[49] * 1000:>7.1f} '
+                f'{quantiles[94] * 1000:>7.1f} {quantiles[98] * 1000:>7.1f} {queries}'
+            )
+
+        self.stdout.write('\nlatency histogram (requests per bucket, upper bound in ms)')
+        bounds = [f'<={bound}' for bound in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]}']
+        self.stdout.write(f'{"endpoint":<8} ' + ' '.join(f'{bound:>7}' for bound in bounds))
+        for name, endpoint in stats.items():
+            buckets = [0] * len(bounds)
+            for latency in endpoint.latencies:
+                ms = latency * 1000
+                buckets[next((i for i, bound in enumerate(HISTOGRAM_MS) if ms <= bound), len(HISTOGRAM_MS))] += 1
+            self.stdout.write(f'{name:<8} ' + ' '.join(f'{bucket:>7}' for bucket in buckets))
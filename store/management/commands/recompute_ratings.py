@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.logic import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Book.rating and the relation counters from relations in chunked set-based UPDATEs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-id', type=int, help='Resume from this book id.')
+        parser.add_argument('--end-id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--partition', type=int, default=0, help='Chunks handled by this process.')
+        parser.add_argument('--partitions', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=1, help='Run this many partitioned processes.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+        if not 0 <= options['partition'] < options['partitions']:
+            raise CommandError('--partition must be between 0 and --partitions - 1.')
+
+        if options['workers'] > 1:
+            return self.run_workers(options)
+
+        def progress(low, high, updated):
+            self.stdout.write(f'[{options["partition"]}] books {low}-{high}: {updated} updated')
+
+        total = recompute_ratings(
+            start_id=options['start_id'], end_id=options['end_id'], chunk_size=options['chunk_size'],
+            partition=options['partition'], partitions=options['partitions'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f'[{options["partition"]}] {total} books updated'))
+
+    def run_workers(self, options):
+        workers = []
+        for partition in range(options['workers']):
+            command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'recompute_ratings',
+                       '--chunk-size', str(options['chunk_size']),
+                       '--partition', str(partition), '--partitions', str(options['workers'])]
+            if options['start_id'] is not None:
+                command += ['--start-id', str(options['start_id'])]
+            if options['end_id'] is not None:
+                command += ['--end-id', str(options['end_id'])]
+            workers.append(subprocess.Popen(command, stdout=sys.stdout, stderr=sys.stderr))
+
+        failed = [worker.args for worker in workers if worker.wait() != 0]
+        if failed:
+            raise CommandError(f'{len(failed)} worker(s) failed.')
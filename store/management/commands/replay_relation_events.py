@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.events import replay_relation_events
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds all Book counters and ratings from the relation event log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        def progress(folded, position):
+            self.stdout.write(f'{folded} events replayed, up to event {position}')
+
+        folded = replay_relation_events(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'{folded} events replayed'))
@@ -0,0 +1,213 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+# Upper bounds in seconds of the request latency histogram.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Layout of the per (view, action) counter lists; the histogram buckets follow FIELDS.
+FIELDS = ('requests', 'seconds', 'db_queries', 'db_seconds', 'serialize_calls', 'serialize_seconds',
+          'set_rating_calls', 'set_rating_seconds')
+INDEX = {name: index for index, name in enumerate(FIELDS)}
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = FIELDS
+
+    def __init__(self):
+        for name in FIELDS:
+            setattr(self, name, 0)
+
+
+class Registry:
+    """
+    In-process counters keyed by (view, action). With METRICS_DIR set they are written to one file per
+    process at most every METRICS_FLUSH_INTERVAL seconds, and ``collect`` sums the files of all workers.
+    Files are named by pid and start time and left behind when a worker exits, so a new worker that
+    reuses the pid neither overwrites the totals of the old one nor makes the counters go backwards.
+    They pile up with every recycled worker; ``manage.py clear_metrics`` removes them on deploy.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{time.time_ns()}'
+        self.counters = {}
+        self.flushed = time.monotonic()
+
+    def observe(self, view, action, timings):
+        with self.lock:
+            # Counters inherited through fork belong to the parent.
+            if self.pid != os.getpid():
+                self.reset()
+            values = self.counters.get((view, action))
+            if values is None:
+                values = self.counters[(view, action)] = [0] * (len(FIELDS) + len(BUCKETS))
+            for index, name in enumerate(FIELDS):
+                values[index] += getattr(timings, name)
+            for index, bound in enumerate(BUCKETS):
+                if timings.seconds <= bound:
+                    values[len(FIELDS) + index] += 1
+            due = time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            if not self.counters:
+                return
+            data = json.dumps([[view, action, values] for (view, action), values in self.counters.items()])
+            self.flushed = time.monotonic()
+            name = self.name
+        tmp = directory / f'{name}.json.tmp'
+        tmp.write_text(data)
+        os.replace(tmp, directory / f'{name}.json')
+
+    def collect(self):
+        """
+        Returns the counters of every worker summed per (view, action).
+        """
+        if not settings.METRICS_DIR:
+            with self.lock:
+                return {key: list(values) for key, values in self.counters.items()}
+
+        self.flush()
+        totals = {}
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            try:
+                rows = json.loads(path.read_text())
+            except (FileNotFoundError, ValueError):
+                continue
+            for view, action, values in rows:
+                total = totals.setdefault((view, action), [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return totals
+
+
+registry = Registry()
+
+# Counters observed since the last flush would be lost when a worker exits.
+atexit.register(registry.flush)
+
+
+@contextmanager
+def timer(name):
+    """
+    Adds the time spent in the block to ``<name>_seconds`` and ``<name>_calls`` of the current request.
+    Outside an instrumented view it does nothing.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, f'{name}_seconds', getattr(timings, f'{name}_seconds') + time.perf_counter() - start)
+        setattr(timings, f'{name}_calls', getattr(timings, f'{name}_calls') + 1)
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_seconds += time.perf_counter() - start
+
+
+class InstrumentedViewMixin:
+    """
+    Records request count, latency up to the rendered response, DB queries and the ``timer`` sections
+    of every request under the view class name and its DRF action.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(_time_query):
+                response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _current.reset(token)
+
+        def observe(response=None):
+            timings.requests = 1
+            timings.seconds = time.perf_counter() - start
+            action = getattr(self, 'action', None) or request.method.lower()
+            registry.observe(type(self).__name__, action, timings)
+
+        if getattr(response, 'is_rendered', True):
+            observe()
+        else:
+            response.add_post_render_callback(observe)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """
+    Returns the collected metrics in the Prometheus text exposition format.
+    """
+    counters = sorted(registry.collect().items())
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+            lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+    def counter(name, field, help_text):
+        family(name, 'counter', help_text, [
+            ('', (('view', view), ('action', action)), values[INDEX[field]])
+            for (view, action), values in counters
+        ])
+
+    histogram = []
+    for (view, action), values in counters:
+        labels = (('view', view), ('action', action))
+        for index, bound in enumerate(BUCKETS):
+            histogram.append(('_bucket', labels + (('le', f'{bound:g}'),), values[len(FIELDS) + index]))
+        histogram.append(('_bucket', labels + (('le', '+Inf'),), values[INDEX['requests']]))
+        histogram.append(('_sum', labels, values[INDEX['seconds']]))
+        histogram.append(('_count', labels, values[INDEX['requests']]))
+    family('books_request_duration_seconds', 'histogram', 'Request latency up to the rendered response.',
+           histogram)
+
+    counter('books_requests_total', 'requests', 'Requests handled.')
+    counter('books_db_queries_total', 'db_queries', 'Database queries run by requests.')
+    counter('books_db_query_seconds_total', 'db_seconds', 'Time spent in database queries.')
+    counter('books_serialization_total', 'serialize_calls', 'BookSerializer.data evaluations.')
+    counter('books_serialization_seconds_total', 'serialize_seconds', 'Time spent in BookSerializer.data.')
+    counter('books_set_rating_total', 'set_rating_calls', 'set_rating calls.')
+    counter('books_set_rating_seconds_total', 'set_rating_seconds', 'Time spent in set_rating.')
+    return '\n'.join(lines) + '\n'
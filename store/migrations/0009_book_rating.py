@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_alter_userbookrelation_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=None, max_digits=3, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_book_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['like', 'id'], name='store_userb_like_f79053_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['in_bookmarks', 'id'], name='store_userb_in_book_b94b52_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['rate', 'id'], name='store_userb_rate_40a941_idx'),
+        ),
+    ]
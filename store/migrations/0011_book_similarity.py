@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_userbookrelation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField(null=True)),
+                ('incremental', models.BooleanField(default=False)),
+                ('books', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userbookrelation',
+            name='changed',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='BookSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='store.book')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='store.book')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='booksimilarity',
+            constraint=models.UniqueConstraint(fields=('book', 'similar'), name='unique_book_similarity'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_book_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookVersion',
+            fields=[
+                ('book_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
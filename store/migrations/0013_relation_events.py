@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_events(apps, schema_editor):
+    # Record the current state of every relation so the log can rebuild aggregates on its own.
+    UserBookRelation = apps.get_model('store', 'UserBookRelation')
+    RelationEvent = apps.get_model('store', 'RelationEvent')
+
+    events = []
+    relations = UserBookRelation.objects.order_by('id').values_list('user_id', 'book_id', 'like', 'in_bookmarks', 'rate')
+    for user_id, book_id, like, in_bookmarks, rate in relations.iterator(chunk_size=10000):
+        if like:
+            events.append(RelationEvent(user_id=user_id, book_id=book_id, kind=1))
+        if in_bookmarks:
+            events.append(RelationEvent(user_id=user_id, book_id=book_id, kind=3))
+        if rate is not None:
+            events.append(RelationEvent(user_id=user_id, book_id=book_id, kind=5, rate=rate))
+        if len(events) >= 10000:
+            RelationEvent.objects.bulk_create(events)
+            events = []
+    RelationEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0012_bookversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rate_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rate_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RelationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Like'), (2, 'Unlike'), (3, 'Bookmark'), (4, 'Unbookmark'), (5, 'Rate')])),
+                ('old_rate', models.PositiveSmallIntegerField(null=True)),
+                ('rate', models.PositiveSmallIntegerField(null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('folded', models.BooleanField(default=False)),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='store.book')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('folded', False)), fields=['id'], name='store_relationevent_unfolded')],
+            },
+        ),
+        migrations.RunPython(seed_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+TABLE = 'store_userbookrelation'
+
+PARTITIONS = 16
+
+
+def rebuild_table(schema_editor, partitioned):
+    """
+    Recreates the relation table, hash partitioned by book_id or not, keeping its rows,
+    identity sequence, indexes and foreign keys under their current names. Postgres only.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [TABLE],
+        )
+        indexes = [definition for definition, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass "
+            "AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_old')
+        columns = f'(LIKE {TABLE}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY)'
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {TABLE} {columns} PARTITION BY HASH (book_id)')
+            for remainder in range(PARTITIONS):
+                cursor.execute(f'CREATE TABLE {TABLE}_p{remainder} PARTITION OF {TABLE} '
+                               f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})')
+        else:
+            cursor.execute(f'CREATE TABLE {TABLE} {columns}')
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_old')
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                       f"FROM {TABLE}")
+        cursor.execute(f'DROP TABLE {TABLE}_old')
+        cursor.execute(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")
+        sequence = cursor.fetchone()[0]
+        if sequence.split('.')[-1] != f'{TABLE}_id_seq':
+            cursor.execute(f'ALTER SEQUENCE {sequence} RENAME TO {TABLE}_id_seq')
+
+        # The partition key has to be part of the primary key; ids stay unique through the sequence.
+        primary_key = '(id, book_id)' if partitioned else '(id)'
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY {primary_key}')
+
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+def partition(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_relation_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
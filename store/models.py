@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 
 
 class Book(models.Model):
@@ -11,6 +12,12 @@ class Book(models.Model):
 
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=None, null=True)
 
+    # Folded from RelationEvent by store.events.fold_relation_events.
+    likes_count = models.PositiveIntegerField(default=0)
+    bookmarks_count = models.PositiveIntegerField(default=0)
+    rate_total = models.PositiveIntegerField(default=0)
+    rate_count = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.name
 
@@ -29,18 +36,109 @@ class UserBookRelation(models.Model):
     like = models.BooleanField(default=False)
     in_bookmarks = models.BooleanField(default=False)
     rate = models.PositiveSmallIntegerField(choices=RATE_CHOICES, null=True)
+    changed = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['like', 'id']),
+            models.Index(fields=['in_bookmarks', 'id']),
+            models.Index(fields=['rate', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.user.username}: {self.book.name}, RATE {self.rate}'
 
+    @property
+    def is_empty(self):
+        return not self.like and not self.in_bookmarks and self.rate is None
+
     def save(self, *args, **kwargs):
+        from store.cache import bump_version
+        from store.events import relation_events
         from store.logic import set_rating
 
-        creating = not self.pk
-        old_rate = self.rate
+        with transaction.atomic():
+            # The stored row, not the loaded instance, is what the events have to start from.
+            old_state = None
+            if self.pk:
+                old_state = UserBookRelation.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'like', 'in_bookmarks', 'rate'
+                ).first()
+            creating = old_state is None
+            old_state = old_state or (False, False, None)
+            super().save(*args, **kwargs)
+            RelationEvent.objects.bulk_create(relation_events(self, *old_state))
 
-        super().save(*args, **kwargs)
-
-        new_rate = self.rate
-        if old_rate != new_rate or creating:
+        # set_rating saves the book, which bumps its cache version; otherwise bump it here.
+        if settings.RELATION_AGGREGATES_SYNC and (old_state[2] != self.rate or creating):
             set_rating(self.book)
+        else:
+            bump_version(self.book_id)
+
+    def delete(self, *args, **kwargs):
+        from store.cache import bump_version
+        from store.events import record_deleted_relations
+
+        with transaction.atomic():
+            record_deleted_relations('id', self.pk)
+            deleted = super().delete(*args, **kwargs)
+        bump_version(self.book_id)
+        return deleted
+
+
+class BookSimilarity(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'similar'], name='unique_book_similarity'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class SimilarityBuild(models.Model):
+    started = models.DateTimeField()
+    finished = models.DateTimeField(null=True)
+    incremental = models.BooleanField(default=False)
+    books = models.PositiveIntegerField(default=0)
+
+
+class BookVersion(models.Model):
+    book_id = models.BigIntegerField(primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+
+class RelationEvent(models.Model):
+    LIKE = 1
+    UNLIKE = 2
+    BOOKMARK = 3
+    UNBOOKMARK = 4
+    RATE = 5
+    KIND_CHOICES = (
+        (LIKE, 'Like'),
+        (UNLIKE, 'Unlike'),
+        (BOOKMARK, 'Bookmark'),
+        (UNBOOKMARK, 'Unbookmark'),
+        (RATE, 'Rate'),
+    )
+
+    # No FK constraints: the log outlives the users and books it mentions.
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    old_rate = models.PositiveSmallIntegerField(null=True)
+    rate = models.PositiveSmallIntegerField(null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    folded = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(folded=False), name='store_relationevent_unfolded'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.book_id}, {self.get_kind_display()}'
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from store.models import BookSimilarity, SimilarityBuild, UserBookRelation, RelationEvent
+
+
+def load_likes():
+    """
+    Returns the like graph as a books x users CSR matrix with L2-normalized rows, and the book ids of its rows.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    pairs = UserBookRelation.objects.filter(like=True).values_list('book_id', 'user_id')
+    data = np.fromiter((value for pair in pairs.iterator(chunk_size=10000) for value in pair), dtype=np.int64)
+    book_ids, rows = np.unique(data[0::2], return_inverse=True)
+    _, columns = np.unique(data[1::2], return_inverse=True)
+
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)),
+                               shape=(len(book_ids), columns.max() + 1 if len(columns) else 0))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix, book_ids
+
+
+def top_neighbours(matrix, rows, top_k, chunk_size):
+    """
+    Yields ``(row, neighbour_rows, scores)`` with the ``top_k`` cosine neighbours of every row in ``rows``.
+    """
+    import numpy as np
+
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        scores = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            neighbours, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = neighbours != row
+            neighbours, values = neighbours[keep], values[keep]
+            if len(values) > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                neighbours, values = neighbours[best], values[best]
+            yield row, neighbours, values
+
+
+def affected_books(matrix, book_ids, changed_ids):
+    """
+    Returns the rows whose neighbour lists may change when the relations of ``changed_ids`` changed:
+    the changed books, the books sharing a reader with them and the books that listed them before.
+    """
+    import numpy as np
+
+    changed = np.flatnonzero(np.isin(book_ids, changed_ids))
+    co_read = (matrix[changed] @ matrix.T).tocsr().indices if len(changed) else np.array([], dtype=np.int64)
+    listed = BookSimilarity.objects.filter(similar_id__in=list(changed_ids)).values_list('book_id', flat=True)
+    affected = np.union1d(changed_ids, np.union1d(book_ids[co_read], np.fromiter(listed, dtype=np.int64)))
+    return affected, np.flatnonzero(np.isin(book_ids, affected))
+
+
+def changed_books(since, book_ids):
+    """
+    Returns the ids of books whose likes may have changed since ``since``: books with relations saved
+    since then, books with like events since then, which include deleted relations, and books that
+    still have neighbours stored but no likes left.
+    """
+    changed = set(UserBookRelation.objects.filter(changed__gte=since).values_list('book_id', flat=True).distinct())
+    changed.update(RelationEvent.objects.filter(
+        created__gte=since, kind__in=(RelationEvent.LIKE, RelationEvent.UNLIKE)
+    ).values_list('book_id', flat=True).distinct())
+    changed.update(set(BookSimilarity.objects.values_list('book_id', flat=True).distinct()) - set(book_ids.tolist()))
+    return changed
+
+
+def build_similarities(top_k=20, chunk_size=1000, incremental=False, progress=None):
+    """
+    Stores the ``top_k`` most similar books of every book, by cosine similarity of their likes.
+
+    With ``incremental`` only the books affected by relations changed since the last finished
+    build are recomputed. ``progress(done, total)`` is called after every chunk.
+    Returns the number of recomputed books.
+    """
+    import numpy as np
+
+    started = timezone.now()
+    last_build = SimilarityBuild.objects.filter(finished__isnull=False).order_by('-started').first()
+    matrix, book_ids = load_likes()
+
+    if incremental and last_build:
+        changed_ids = np.fromiter(changed_books(last_build.started, book_ids), dtype=np.int64)
+        stale_ids, rows = affected_books(matrix, book_ids, changed_ids)
+        stale = Q(book_id__in=stale_ids.tolist())
+    else:
+        incremental = False
+        stale_ids, rows = book_ids, np.arange(len(book_ids))
+        stale = Q()
+
+    build = SimilarityBuild.objects.create(started=started, incremental=incremental)
+    with transaction.atomic():
+        BookSimilarity.objects.filter(stale).delete()
+        similarities = []
+        for done, (row, neighbours, scores) in enumerate(top_neighbours(matrix, rows, top_k, chunk_size), 1):
+            similarities.extend(
+                BookSimilarity(book_id=int(book_ids[row]), similar_id=int(book_ids[neighbour]), score=score)
+                for neighbour, score in zip(neighbours.tolist(), scores.tolist())
+            )
+            if len(similarities) >= 10000 or done == len(rows):
+                BookSimilarity.objects.bulk_create(similarities)
+                similarities = []
+            if progress and (done % chunk_size == 0 or done == len(rows)):
+                progress(done, len(rows))
+
+    build.finished = timezone.now()
+    build.books = len(stale_ids)
+    build.save()
+    return len(stale_ids)
@@ -0,0 +1,268 @@
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.filters import SearchFilter
+
+from store.models import Book
+
+# magic, format version, number of terms, log offset already contained in the segment
+HEADER = struct.Struct('<4sIQQ')
+MAGIC = b'BKIX'
+VERSION = 1
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def book_terms(name, author):
+    return sorted(set(tokenize(name)) | set(tokenize(author)))
+
+
+def write_segment(path, postings, log_start=0):
+    """
+    Writes ``postings`` (term -> ascending book ids) as an immutable segment file: the header, term and
+    posting offset tables, all posting lists as one uint64 array and finally the UTF-8 term blob.
+    """
+    terms = sorted(postings)
+    encoded = [term.encode() for term in terms]
+    term_offsets = array('Q', [0])
+    posting_offsets = array('Q', [0])
+    ids = array('Q')
+    for term, data in zip(terms, encoded):
+        term_offsets.append(term_offsets[-1] + len(data))
+        ids.extend(postings[term])
+        posting_offsets.append(len(ids))
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(terms), log_start))
+        file.write(term_offsets.tobytes())
+        file.write(posting_offsets.tobytes())
+        file.write(ids.tobytes())
+        file.write(b''.join(encoded))
+
+
+class Segment:
+    """
+    Read-only view of a segment file through mmap, so the pages are shared by every worker process.
+    Indexing returns the sorted terms, which makes it usable with ``bisect``.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.log_start = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a book search index.')
+
+        view = memoryview(self.map)
+        position = HEADER.size
+        self.term_offsets = view[position:position + 8 * (count + 1)].cast('Q')
+        position += 8 * (count + 1)
+        self.posting_offsets = view[position:position + 8 * (count + 1)].cast('Q')
+        position += 8 * (count + 1)
+        self.ids = view[position:position + 8 * self.posting_offsets[count]].cast('Q')
+        self.blob = view[position + 8 * self.posting_offsets[count]:]
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return str(self.blob[self.term_offsets[index]:self.term_offsets[index + 1]], 'utf-8')
+
+    def prefix_ids(self, prefix):
+        index = bisect_left(self, prefix)
+        while index < self.count and self[index].startswith(prefix):
+            yield from self.ids[self.posting_offsets[index]:self.posting_offsets[index + 1]]
+            index += 1
+
+
+class SearchIndex:
+    """
+    Inverted index of book name/author words: an mmapped base segment plus a shared append-only log
+    of later changes, which every process replays into a small in-memory overlay before searching.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + '.log')
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        # Guards the segment, log offset and overlay against the other threads of this process.
+        self.mutex = threading.RLock()
+        self.segment = None
+        self.identity = None
+        self.log_offset = 0
+        self.added = defaultdict(set)
+        self.overlay_terms = {}
+        self.stale = set()
+
+    @contextmanager
+    def lock(self, operation):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as file:
+            fcntl.flock(file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """
+        Picks up a rebuilt segment and new log records. Returns False when no index has been built.
+        """
+        with self.mutex:
+            with self.lock(fcntl.LOCK_SH):
+                try:
+                    stat = os.stat(self.path)
+                except FileNotFoundError:
+                    self.segment = self.identity = None
+                    return False
+
+                if (stat.st_ino, stat.st_mtime_ns) != self.identity:
+                    self.segment = Segment(self.path)
+                    self.identity = (stat.st_ino, stat.st_mtime_ns)
+                    self.log_offset = self.segment.log_start
+                    self.added.clear()
+                    self.overlay_terms.clear()
+                    self.stale.clear()
+
+                start = self.log_offset
+                try:
+                    with open(self.log_path, 'rb') as file:
+                        file.seek(start)
+                        data = file.read()
+                except FileNotFoundError:
+                    data = b''
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                self.apply(json.loads(line))
+            self.log_offset = start + end
+            return True
+
+    def apply(self, record):
+        book_id = record['id']
+        self.stale.add(book_id)
+        for term in self.overlay_terms.pop(book_id, ()):
+            self.added[term].discard(book_id)
+        if record['terms'] is not None:
+            self.overlay_terms[book_id] = record['terms']
+            for term in record['terms']:
+                self.added[term].add(book_id)
+
+    def search(self, terms):
+        """
+        Returns the ids of books where every word of ``terms`` starts a word of the name or author,
+        or None when there is no index to answer from.
+        """
+        with self.mutex:
+            if not self.refresh():
+                return None
+
+            result = None
+            for token in {token for term in terms for token in tokenize(term)}:
+                ids = set(self.segment.prefix_ids(token)) - self.stale
+                for term, book_ids in self.added.items():
+                    if term.startswith(token):
+                        ids |= book_ids
+                result = ids if result is None else result & ids
+                if not result:
+                    break
+            return result or set()
+
+    def record(self, book_id, terms=None):
+        line = json.dumps({'id': book_id, 'terms': terms}) + '\n'
+        with self.lock(fcntl.LOCK_EX):
+            with open(self.log_path, 'ab') as file:
+                file.write(line.encode())
+
+    def rebuild(self, books):
+        """
+        Writes a new segment from ``books`` (``(id, name, author)`` in id order) and swaps it in,
+        keeping the log records appended while it was being built.
+        """
+        with self.lock(fcntl.LOCK_SH):
+            start = self.log_path.stat().st_size if self.log_path.exists() else 0
+
+        postings = defaultdict(list)
+        count = 0
+        for book_id, name, author in books:
+            for term in book_terms(name, author):
+                postings[term].append(book_id)
+            count += 1
+        segment_tmp = self.path.with_name(self.path.name + '.tmp')
+        write_segment(segment_tmp, postings)
+
+        with self.lock(fcntl.LOCK_EX):
+            tail = b''
+            if self.log_path.exists():
+                with open(self.log_path, 'rb') as file:
+                    file.seek(start)
+                    tail = file.read()
+            log_tmp = self.log_path.with_name(self.log_path.name + '.tmp')
+            log_tmp.write_bytes(tail)
+            os.replace(segment_tmp, self.path)
+            os.replace(log_tmp, self.log_path)
+        return count
+
+
+_indexes = {}
+
+
+def get_index():
+    path = str(settings.BOOK_SEARCH_INDEX)
+    if path not in _indexes:
+        _indexes[path] = SearchIndex(path)
+    return _indexes[path]
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    SearchFilter that answers from the local index when BOOK_SEARCH_BACKEND is 'index' and only fetches
+    the matching ids. Unlike ILIKE, a term has to match the start of a word in the name or author.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if terms and settings.BOOK_SEARCH_BACKEND == 'index':
+            ids = get_index().search(terms)
+            if ids is not None:
+                return queryset.filter(id__in=ids)
+        return super().filter_queryset(request, queryset, view)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, update_fields=None, **kwargs):
+    if settings.BOOK_SEARCH_BACKEND != 'index':
+        return
+    if update_fields is not None and not {'name', 'author'} & set(update_fields):
+        return
+    terms = book_terms(instance.name, instance.author)
+    transaction.on_commit(lambda: get_index().record(instance.pk, terms))
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    if settings.BOOK_SEARCH_BACKEND == 'index':
+        book_id = instance.pk
+        transaction.on_commit(lambda: get_index().record(book_id))
@@ -1,17 +1,75 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ModelSerializer
 
+from store.metrics import timer
 from store.models import Book, UserBookRelation
 
 
+def get_requested_fields(request, fields):
+    """
+    Returns the names from ``fields`` selected by the ``fields`` and ``exclude`` query parameters.
+    Raises a ValidationError for names that are not in ``fields``.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return tuple(fields)
+
+    selected = _split_param(request.query_params.get('fields'))
+    excluded = _split_param(request.query_params.get('exclude'))
+    errors = {param: f'Unknown fields: {", ".join(sorted(names - set(fields)))}.'
+              for param, names in (('fields', selected), ('exclude', excluded)) if names - set(fields)}
+    if errors:
+        raise serializers.ValidationError(errors)
+    return tuple(name for name in fields if (not selected or name in selected) and name not in excluded)
+
+
+def _split_param(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+class SparseFieldsetMixin:
+    """
+    Drops the fields that were not requested through ``?fields=`` or were listed in ``?exclude=``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = get_requested_fields(self.context.get('request'), self.fields)
+        for name in set(self.fields) - set(requested):
+            self.fields.pop(name)
+
+
+class TimedDataMixin:
+    """
+    Counts the time spent building ``.data`` as serialization time of the current request. That includes
+    evaluating lazy querysets, so it overlaps the request's DB time.
+    """
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class ReaderListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # The readers join has no order of its own; sorting here keeps prefetched readers usable.
+        return super().to_representation(sorted(data.all(), key=lambda user: user.pk))
+
+
 class BookReaderSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = ("first_name", "last_name")
+        list_serializer_class = ReaderListSerializer
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedDataMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     # likes_count = serializers.SerializerMethodField()
     annotated_likes = serializers.IntegerField(read_only=True)
     rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
@@ -21,6 +79,7 @@ class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ('id', 'name', 'price', 'author', 'annotated_likes', 'rating', 'owner_name', 'readers')
+        list_serializer_class = TimedListSerializer
 
     # def get_likes_count(self, instance):
     #     return UserBookRelation.objects.filter(book=instance, like=True).count()
@@ -0,0 +1,58 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from store.models import Book, UserBookRelation
+
+ADMIN = apps.is_installed('django.contrib.admin')
+
+if ADMIN:
+    from store.admin import EstimatedCountPaginator
+
+
+@skipUnless(ADMIN, 'requires the admin')
+class EstimatedCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        patcher = patch.object(EstimatedCountPaginator, 'estimate_threshold', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        Book.objects.create(name='Test Book 2', price=55, author='Author 2')
+
+    def test_filtered_is_exact(self):
+        self.assertEqual(1, EstimatedCountPaginator(Book.objects.filter(author='Author 1'), 10).count)
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires Postgres')
+    def test_unfiltered_is_estimated(self):
+        with CaptureQueriesContext(connection) as queries:
+            EstimatedCountPaginator(Book.objects.all(), 10).count
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+
+@skipUnless(ADMIN, 'requires the admin')
+class RelationChangelistTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin')
+        self.book = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.client.force_login(self.admin)
+
+    def get_changelist(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/store/userbookrelation/', {'like__exact': 1})
+        self.assertEqual(200, response.status_code)
+        return len(queries)
+
+    def test_query_count(self):
+        UserBookRelation.objects.create(user=self.admin, book=self.book, like=True)
+        # The first request also fills the session user cache.
+        self.get_changelist()
+        queries = self.get_changelist()
+        for index in range(5):
+            UserBookRelation.objects.create(user=User.objects.create_user(username=f'reader{index}'),
+                                            book=self.book, like=True)
+        self.assertEqual(queries, self.get_changelist())
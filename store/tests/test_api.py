@@ -3,14 +3,14 @@ import json
 from django.contrib.auth.models import User
 from django.db import connection
 from django.db.models import Count, Case, When, Avg
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.test import APITestCase
 
-from store.models import Book, UserBookRelation
+from store.models import Book, UserBookRelation, RelationEvent
 from store.serializers import BookSerializer
 
 
@@ -47,6 +47,49 @@ class BookApiTestCase(APITestCase):
         self.assertEqual(status.HTTP_200_OK, response.status_code)
         self.assertEqual(serializer_data, response.data)
 
+    def test_get_price_range(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'price__gte': 20, 'price__lt': 50, 'fields': 'id'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'id': self.book_1.id}], response.data)
+
+    def test_get_price_in(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'price__in': '25,30', 'fields': 'id'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'id': self.book_1.id}], response.data)
+
+    def test_price_facets(self):
+        url = reverse('book-price-facets')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data={'bucket_size': 20, 'search': 'Test'})
+        self.assertEqual(1, len(queries))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'min': '25.00', 'max': '55.00',
+                          'buckets': [{'low': '20.00', 'high': '40.00', 'count': 1},
+                                      {'low': '40.00', 'high': '60.00', 'count': 2}]}, response.data)
+        with self.assertNumQueries(0):
+            self.client.get(url, data={'bucket_size': 20, 'search': 'Test'})
+
+        self.book_2.price = 10
+        self.book_2.save()
+        response = self.client.get(url, data={'bucket_size': 20, 'search': 'Test'})
+        self.assertEqual('10.00', response.data['min'])
+
+    def test_price_facets_wrong(self):
+        url = reverse('book-price-facets')
+        for size in ('x', '0', '-5', 'NaN', 'sNaN', 'Infinity', '1e-30'):
+            response = self.client.get(url, data={'bucket_size': size})
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code, size)
+
+    @override_settings(PRICE_FACETS_MAX_BUCKETS=1)
+    def test_price_facets_too_many_buckets(self):
+        url = reverse('book-price-facets')
+        response = self.client.get(url, data={'bucket_size': 5})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        response = self.client.get(url, data={'bucket_size': 100})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
     def test_get_ordering(self):
         url = reverse('book-list')
         response = self.client.get(url, data={'ordering': 'price'})
@@ -69,6 +112,37 @@ class BookApiTestCase(APITestCase):
         self.assertEqual(serializer_data[0]['rating'], "5.00")
         self.assertEqual(serializer_data[0]['annotated_likes'], 1)
 
+    def test_get_fields(self):
+        url = reverse('book-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data={'fields': 'id,name,price'})
+            self.assertEqual(1, len(queries))
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertNotIn('"author"', queries[0]['sql'])
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'id': self.book_1.id, 'name': 'Test Book 1', 'price': '25.00'},
+                          {'id': self.book_2.id, 'name': 'Test Book 2', 'price': '55.00'},
+                          {'id': self.book_3.id, 'name': 'Test Book 1', 'price': '55.00'}], response.data)
+
+    def test_get_exclude(self):
+        url = reverse('book-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data={'exclude': 'readers,annotated_likes', 'search': 'Author 1'})
+            self.assertEqual(1, len(queries))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'id': self.book_1.id, 'name': 'Test Book 1', 'price': '25.00', 'author': 'Author 1',
+                          'rating': '5.00', 'owner_name': 'testuser'}, response.data[0])
+
+    def test_get_unknown_fields(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'fields': 'id,bogus', 'exclude': 'readers,other'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual({'fields': 'Unknown fields: bogus.', 'exclude': 'Unknown fields: other.'},
+                         response.data)
+
+        response = self.client.get(reverse('book-detail', args=(self.book_1.id,)), data={'fields': 'bogus'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
     def test_create(self):
         self.assertEqual(3, Book.objects.all().count())
         url = reverse('book-list')
@@ -210,4 +284,20 @@ class BookRelationTestCase(APITestCase):
         response = self.client.patch(url, data=json_data, content_type='application/json')
         self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code, response.data)
 
+    @override_settings(PERSIST_EMPTY_RELATIONS=False)
+    def test_empty_not_persisted(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.force_login(self.user)
+        response = self.client.patch(url, data=json.dumps({"like": False}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse(UserBookRelation.objects.exists())
 
+        response = self.client.patch(url, data=json.dumps({"like": True}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(UserBookRelation.objects.get(user=self.user, book=self.book_1).like)
+
+        response = self.client.patch(url, data=json.dumps({"like": False}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse(UserBookRelation.objects.exists())
+        self.assertEqual([RelationEvent.LIKE, RelationEvent.UNLIKE],
+                         list(RelationEvent.objects.order_by('id').values_list('kind', flat=True)))
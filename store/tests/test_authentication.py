@@ -0,0 +1,117 @@
+from importlib import import_module
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.authentication import get_cached_user, create_token, check_session_cache
+from store.models import Book
+
+
+class CachedUserTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+
+    def test_cached(self):
+        self.assertEqual(self.user, get_cached_user(self.user.id))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user, get_cached_user(self.user.id))
+
+    def test_invalidated_on_save(self):
+        get_cached_user(self.user.id)
+        self.user.first_name = 'changed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual('changed', get_cached_user(self.user.id).first_name)
+
+    def test_missing(self):
+        self.assertIsNone(get_cached_user(self.user.id + 1))
+
+
+class SignedTokenTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='secret-password')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+
+    def test_obtain_token(self):
+        response = self.client.post('/token/', data={'username': 'testuser', 'password': 'secret-password'},
+                                    format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(create_token(self.user), response.data['token'])
+
+    def test_token(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {create_token(self.user)}')
+        response = self.client.patch(url, data={'like': True}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_token_invalid(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {create_token(self.user)}x')
+        response = self.client.patch(url, data={'like': True}, format='json')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_token_password_changed(self):
+        token = create_token(self.user)
+        self.user.set_password('other-password')
+        self.user.save()
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        response = self.client.patch(url, data={'like': True}, format='json')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+
+class SessionTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+
+    def login(self, backend):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(self.user.pk)
+        session[BACKEND_SESSION_KEY] = backend
+        session[HASH_SESSION_KEY] = self.user.get_session_auth_hash()
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def test_oauth_session(self):
+        # A GitHub login on the full profile has to stay valid on API-only workers.
+        self.login('social_core.backends.github.GithubOAuth2')
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        response = self.client.patch(url, data={'like': True}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_oauth_session_cached(self):
+        self.login('social_core.backends.github.GithubOAuth2')
+        with patch('store.authentication.get_cached_user', wraps=get_cached_user) as cached:
+            self.client.get(reverse('book-list'))
+        cached.assert_called_once_with(self.user.pk)
+
+    def test_model_backend_session(self):
+        # Logins made before CachedModelBackend replaced ModelBackend.
+        self.login('django.contrib.auth.backends.ModelBackend')
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        response = self.client.patch(url, data={'like': True}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+
+class SessionCacheCheckTestCase(SimpleTestCase):
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_cache(self):
+        self.assertEqual(['store.E001'], [error.id for error in check_session_cache(None)])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                           'LOCATION': 'redis://127.0.0.1:6379/1'}})
+    def test_shared_cache(self):
+        self.assertEqual([], check_session_cache(None))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_sessions(self):
+        self.assertEqual([], check_session_cache(None))
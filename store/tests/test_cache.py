@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from store.cache import book_cache, BookCache
+from store.models import Book, UserBookRelation, BookVersion
+
+
+class BookCacheTestCase(APITestCase):
+    def setUp(self):
+        patcher = patch.object(book_cache, 'max_bytes', 1024 * 1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        book_cache.clear()
+        self.user = User.objects.create_user(username='testuser', first_name='test', last_name='test')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1', owner=self.user)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        self.url = reverse('book-detail', args=(self.book_1.id,))
+
+    def test_hit(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(response.data, cached.data)
+        self.assertEqual([{'first_name': 'test', 'last_name': 'test'}], cached.data['readers'])
+
+    def test_invalidated_on_change(self):
+        self.client.get(self.url)
+        UserBookRelation.objects.create(book=self.book_1, user=User.objects.create_user(username='testuser2'),
+                                        like=True)
+        self.assertEqual(2, self.client.get(self.url).data['annotated_likes'])
+
+    def test_invalidated_by_other_process(self):
+        self.client.get(self.url)
+        Book.objects.filter(id=self.book_1.id).update(name='Renamed')
+        BookVersion.objects.filter(book_id=self.book_1.id).update(version=F('version') + 1)
+        self.assertEqual('Renamed', self.client.get(self.url).data['name'])
+
+    def test_rate_bumps_once(self):
+        self.client.force_login(self.user)
+        version = BookVersion.objects.get(book_id=self.book_1.id).version
+        self.client.patch(reverse('userbookrelation-detail', args=(self.book_1.id,)), data={'rate': 3}, format='json')
+        self.assertEqual(version + 1, BookVersion.objects.get(book_id=self.book_1.id).version)
+
+    def test_deleted_book(self):
+        self.client.get(self.url)
+        self.book_1.delete()
+        self.assertFalse(BookVersion.objects.filter(book_id=self.book_1.id).exists())
+        self.assertEqual(404, self.client.get(self.url).status_code)
+
+    def test_missing_book(self):
+        for book_id in range(self.book_1.id + 1, self.book_1.id + 4):
+            self.assertEqual(404, self.client.get(reverse('book-detail', args=(book_id,))).status_code)
+        self.assertEqual([self.book_1.id], list(BookVersion.objects.values_list('book_id', flat=True)))
+
+    def test_changed_while_read(self):
+        # A change between reading the book and creating its missing version row must not be cached over.
+        def retrieve(*args, **kwargs):
+            Book.objects.filter(id=self.book_1.id).update(name='Renamed')
+            BookVersion.objects.create(book_id=self.book_1.id, version=1)
+            return response
+
+        response = self.client.get(self.url)
+        BookVersion.objects.all().delete()
+        with patch('rest_framework.mixins.RetrieveModelMixin.retrieve', side_effect=retrieve):
+            self.client.get(self.url)
+        self.assertEqual('Renamed', self.client.get(self.url).data['name'])
+
+    def test_deleted_user(self):
+        self.client.get(self.url)
+        self.user.delete()
+        self.assertEqual([], self.client.get(self.url).data['readers'])
+
+    def test_deleted_owner(self):
+        owner = User.objects.create_user(username='owner')
+        Book.objects.filter(id=self.book_1.id).update(owner=owner)
+        BookVersion.objects.filter(book_id=self.book_1.id).update(version=F('version') + 1)
+        self.assertEqual('owner', self.client.get(self.url).data['owner_name'])
+        owner.delete()
+        self.assertEqual('', self.client.get(self.url).data['owner_name'])
+
+    def test_renamed_owner(self):
+        self.client.get(self.url)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual('renamed', self.client.get(self.url).data['owner_name'])
+
+    def test_renamed_reader(self):
+        reader = User.objects.create_user(username='reader', first_name='old')
+        UserBookRelation.objects.create(book=self.book_1, user=reader, like=True)
+        self.client.get(self.url)
+        reader.first_name = 'new'
+        reader.save(update_fields=['first_name'])
+        self.assertIn({'first_name': 'new', 'last_name': ''}, self.client.get(self.url).data['readers'])
+
+    def test_login_keeps_cache(self):
+        version = BookVersion.objects.get(book_id=self.book_1.id).version
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(version, BookVersion.objects.get(book_id=self.book_1.id).version)
+
+    def test_cascade_cost(self):
+        book = Book.objects.create(name='Test Book 2', price=25, author='Author 1')
+        UserBookRelation.objects.create(book=book, user=self.user, like=True)
+        with CaptureQueriesContext(connection) as one:
+            book.delete()
+
+        book = Book.objects.create(name='Test Book 3', price=25, author='Author 1')
+        for index in range(5):
+            UserBookRelation.objects.create(book=book, user=User.objects.create_user(username=f'reader{index}'))
+        with CaptureQueriesContext(connection) as many:
+            book.delete()
+        self.assertEqual(len(one), len(many))
+
+    def test_byte_budget(self):
+        cache = BookCache(max_bytes=1200)
+        data = {'id': 1, 'name': 'x' * 500, 'price': '25.00', 'author': 'Author 1', 'annotated_likes': 0,
+                'rating': None, 'owner_name': '', 'readers': []}
+        cache.put(1, 0, data)
+        cache.put(2, 0, dict(data, id=2))
+        stats = cache.stats()
+        self.assertEqual(1, stats['entries'])
+        self.assertEqual(1, stats['evictions'])
+        self.assertLessEqual(stats['bytes'], 1200)
+        self.assertIsNone(cache.get(1))
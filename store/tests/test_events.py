@@ -0,0 +1,100 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from store.events import fold_relation_events, replay_relation_events
+from store.models import Book, UserBookRelation, RelationEvent
+
+
+class RelationEventsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.user2 = User.objects.create_user(username='testuser2')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.book_2 = Book.objects.create(name='Test Book 2', price=55, author='Author 1')
+
+    def test_events(self):
+        relation = UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        relation = UserBookRelation.objects.get(id=relation.id)
+        relation.like = False
+        relation.in_bookmarks = True
+        relation.rate = 3
+        relation.save()
+        relation.save()
+        self.assertEqual([(RelationEvent.LIKE, None, None), (RelationEvent.RATE, None, 5),
+                          (RelationEvent.UNLIKE, None, None), (RelationEvent.BOOKMARK, None, None),
+                          (RelationEvent.RATE, 5, 3)],
+                         list(RelationEvent.objects.order_by('id').values_list('kind', 'old_rate', 'rate')))
+
+    def test_stale_instance(self):
+        relation = UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True)
+        UserBookRelation.objects.filter(id=relation.id).update(like=False)
+        relation.refresh_from_db()
+        relation.like = True
+        relation.save()
+        UserBookRelation(id=relation.id, book=self.book_1, user=self.user, like=True, rate=4).save()
+        self.assertEqual([(RelationEvent.LIKE, None), (RelationEvent.LIKE, None), (RelationEvent.RATE, 4)],
+                         list(RelationEvent.objects.order_by('id').values_list('kind', 'rate')))
+
+    def test_fold(self):
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        relation = UserBookRelation.objects.create(book=self.book_1, user=self.user2, like=True, rate=4)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user, in_bookmarks=True)
+        self.assertEqual(5, fold_relation_events())
+
+        relation.like = False
+        relation.rate = None
+        relation.save()
+        self.assertEqual(2, fold_relation_events())
+        self.assertEqual(0, fold_relation_events())
+
+        self.book_1.refresh_from_db()
+        self.assertEqual((1, 0, 5, 1), (self.book_1.likes_count, self.book_1.bookmarks_count,
+                                        self.book_1.rate_total, self.book_1.rate_count))
+        self.assertEqual('5.00', str(self.book_1.rating))
+        self.book_2.refresh_from_db()
+        self.assertEqual((0, 1, None), (self.book_2.likes_count, self.book_2.bookmarks_count, self.book_2.rating))
+
+    def test_fold_late_commit(self):
+        RelationEvent.objects.create(id=1000, user=self.user, book=self.book_1, kind=RelationEvent.LIKE)
+        self.assertEqual(1, fold_relation_events())
+        # An event committed after a later id was folded is still folded.
+        RelationEvent.objects.create(id=500, user=self.user, book=self.book_2, kind=RelationEvent.LIKE)
+        self.assertEqual(1, fold_relation_events())
+        self.book_2.refresh_from_db()
+        self.assertEqual(1, self.book_2.likes_count)
+
+    def test_delete(self):
+        relation = UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        fold_relation_events()
+        relation.delete()
+        fold_relation_events()
+        self.book_1.refresh_from_db()
+        self.assertEqual((0, 0, None), (self.book_1.likes_count, self.book_1.rate_count, self.book_1.rating))
+
+    def test_cascade(self):
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user2, in_bookmarks=True)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user, like=True, rate=3)
+        fold_relation_events()
+        self.user.delete()
+        self.assertEqual([(RelationEvent.UNLIKE, self.book_1.id, None), (RelationEvent.UNLIKE, self.book_2.id, None),
+                          (RelationEvent.RATE, self.book_1.id, 5), (RelationEvent.RATE, self.book_2.id, 3)],
+                         sorted(RelationEvent.objects.filter(folded=False).values_list('kind', 'book_id', 'old_rate')))
+        fold_relation_events()
+        self.book_2.refresh_from_db()
+        self.assertEqual((0, 0, None), (self.book_2.likes_count, self.book_2.rate_count, self.book_2.rating))
+
+        self.book_1.delete()
+        self.assertEqual([RelationEvent.UNBOOKMARK],
+                         list(RelationEvent.objects.filter(folded=False).values_list('kind', flat=True)))
+
+    def test_replay(self):
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True, rate=5)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user2, like=True, rate=2)
+        fold_relation_events()
+        Book.objects.update(likes_count=100, rating=1)
+
+        self.assertEqual(4, replay_relation_events())
+        self.book_1.refresh_from_db()
+        self.assertEqual(2, self.book_1.likes_count)
+        self.assertEqual('3.50', str(self.book_1.rating))
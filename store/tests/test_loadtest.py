@@ -0,0 +1,57 @@
+import io
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from store.management.commands.loadtest import parse_mix
+from store.models import Book
+
+
+class ParseMixTestCase(SimpleTestCase):
+    def test_ok(self):
+        self.assertEqual({'list': 2.0, 'rate': 0.5}, parse_mix('list=2,rate=0.5'))
+
+    def test_invalid(self):
+        for mix in ('list', 'list=x', 'list=1,', 'list=1=2', 'bogus=1', 'list=-1,detail=2', 'list=nan',
+                    'list=inf', 'list=0,detail=0'):
+            with self.assertRaises(CommandError, msg=mix):
+                parse_mix(mix)
+
+
+# Worker threads use their own connections, so the books have to be committed.
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class LoadtestTestCase(TransactionTestCase):
+    def setUp(self):
+        Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        Book.objects.create(name='Test Book 2', price=55, author='Author 2')
+
+    def test_smoke(self):
+        out = io.StringIO()
+        call_command('loadtest', requests=20, concurrency=2, mix='list=1,detail=1', stdout=out)
+        report = out.getvalue().splitlines()
+        self.assertTrue(report[0].startswith('20 requests in '))
+        self.assertEqual(['endpoint', 'count', 'errors'], report[1].split()[:3])
+        rows = {line.split()[0]: line.split() for line in report[2:4]}
+        self.assertEqual({'list', 'detail'}, set(rows))
+        self.assertEqual(20, sum(int(row[1]) for row in rows.values()))
+        self.assertEqual(['0', '0'], [row[2] for row in rows.values()])
+        self.assertIn('latency histogram (requests per bucket, upper bound in ms)', report)
+
+    def test_writes(self):
+        # One client thread: concurrent writers make SQLite fail with "table is locked".
+        out = io.StringIO()
+        call_command('loadtest', requests=9, concurrency=1, mix='like=1,rate=1,create=1', stdout=out)
+        rows = [line.split() for line in out.getvalue().splitlines()[2:5]]
+        self.assertEqual(9, sum(int(row[1]) for row in rows))
+        self.assertEqual(['0', '0', '0'], [row[2] for row in rows])
+        self.assertTrue(User.objects.filter(username='loadtest').exists())
+
+    def test_server_error(self):
+        out = io.StringIO()
+        with patch('store.views.BookViewSet.list', side_effect=RuntimeError), \
+                self.assertLogs('django.request', 'ERROR'):
+            call_command('loadtest', requests=6, concurrency=2, mix='list=1', stdout=out)
+        row = out.getvalue().splitlines()[2].split()
+        self.assertEqual(['list', '6', '6'], row[:3])
@@ -1,8 +1,13 @@
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
 
-from store.logic import set_rating
-from store.models import Book, UserBookRelation
+from store.events import fold_relation_events
+from store.logic import set_rating, recompute_ratings, compact_relations, update_book_aggregates
+from store.models import Book, UserBookRelation, RelationEvent
 
 
 class SetRatingTestCases(TestCase):
@@ -24,3 +29,108 @@ class SetRatingTestCases(TestCase):
         set_rating(self.book_1)
         self.book_1.refresh_from_db()
         self.assertEqual('4.67',str(self.book_1.rating))
+
+
+class RecomputeRatingsTestCases(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.user2 = User.objects.create_user(username='testuser2')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.book_2 = Book.objects.create(name='Test Book 2', price=55, author='Author 1')
+        self.book_3 = Book.objects.create(name='Test Book 3', price=55, author='Author 2')
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, rate=5)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user2, rate=4)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user, rate=3)
+        Book.objects.update(rating=1)
+
+    def test_ok(self):
+        with self.assertNumQueries(8):
+            self.assertEqual(3, recompute_ratings())
+        ratings = dict(Book.objects.values_list('id', 'rating'))
+        self.assertEqual('4.50', str(ratings[self.book_1.id]))
+        self.assertEqual('3.00', str(ratings[self.book_2.id]))
+        self.assertIsNone(ratings[self.book_3.id])
+
+    def test_counters(self):
+        UserBookRelation.objects.create(book=self.book_3, user=self.user, like=True, in_bookmarks=True)
+        Book.objects.update(likes_count=7, bookmarks_count=7, rate_total=7, rate_count=7)
+        recompute_ratings()
+        counters = Book.objects.order_by('id').values_list('likes_count', 'bookmarks_count', 'rate_total',
+                                                           'rate_count')
+        self.assertEqual([(0, 0, 9, 2), (0, 0, 3, 1), (1, 1, 0, 0)], list(counters))
+        self.assertFalse(RelationEvent.objects.filter(folded=False).exists())
+        self.assertEqual(0, fold_relation_events())
+
+    def test_chunk_size(self):
+        with self.assertRaises(ValueError):
+            recompute_ratings(chunk_size=0)
+        with self.assertRaises(CommandError):
+            call_command('recompute_ratings', chunk_size=0)
+
+    def test_partitions(self):
+        chunks = []
+        for partition in range(2):
+            recompute_ratings(chunk_size=1, partition=partition, partitions=2,
+                              progress=lambda low, high, updated: chunks.append(low))
+        self.assertEqual([self.book_1.id, self.book_2.id, self.book_3.id], sorted(chunks))
+        self.book_1.refresh_from_db()
+        self.assertEqual('4.50', str(self.book_1.rating))
+
+    def test_range(self):
+        recompute_ratings(start_id=self.book_2.id, end_id=self.book_2.id)
+        ratings = dict(Book.objects.values_list('id', 'rating'))
+        self.assertEqual('1.00', str(ratings[self.book_1.id]))
+        self.assertEqual('3.00', str(ratings[self.book_2.id]))
+
+
+def operational_error(sqlstate):
+    cause = Exception('could not serialize access due to concurrent update')
+    cause.pgcode = sqlstate
+    error = OperationalError(*cause.args)
+    error.__cause__ = cause
+    return error
+
+
+# The retry only applies when the chunk's transaction is the outermost one.
+class RecomputeRetryTestCases(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, rate=4)
+        Book.objects.update(rating=None)
+
+    def test_serialization_failure(self):
+        errors = [operational_error('40001')]
+
+        def update(low, high):
+            if errors:
+                raise errors.pop()
+            return update_book_aggregates(low, high)
+
+        with patch('store.logic.update_book_aggregates', side_effect=update) as mocked:
+            self.assertEqual(1, recompute_ratings())
+        self.assertEqual(2, mocked.call_count)
+        self.book_1.refresh_from_db()
+        self.assertEqual('4.00', str(self.book_1.rating))
+
+    def test_other_error(self):
+        with patch('store.logic.update_book_aggregates', side_effect=operational_error('57014')):
+            with self.assertRaises(OperationalError):
+                recompute_ratings()
+
+
+class CompactRelationsTestCases(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.user2 = User.objects.create_user(username='testuser2')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.book_2 = Book.objects.create(name='Test Book 2', price=55, author='Author 1')
+        UserBookRelation.objects.create(book=self.book_1, user=self.user)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user2, like=True)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user, rate=3)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user2)
+
+    def test_ok(self):
+        self.assertEqual(2, compact_relations(batch_size=1))
+        self.assertEqual([(self.book_1.id, self.user2.id), (self.book_2.id, self.user.id)],
+                         list(UserBookRelation.objects.order_by('id').values_list('book_id', 'user_id')))
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from store.cache import book_cache
+from store.metrics import registry, RequestTimings
+from store.models import Book, UserBookRelation
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        patcher = patch.object(book_cache, 'max_bytes', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        registry.reset()
+        self.user = User.objects.create_user(username='testuser')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual('text/plain; version=0.0.4; charset=utf-8', response['Content-Type'])
+        return response.content.decode()
+
+    def test_metrics(self):
+        self.client.get(reverse('book-list'))
+        self.client.get(reverse('book-detail', args=(self.book_1.id,)))
+        UserBookRelation.objects.create(user=self.user, book=self.book_1)
+        self.client.force_login(self.user)
+        self.client.patch(reverse('userbookrelation-detail', args=(self.book_1.id,)), data={'rate': 3},
+                          format='json')
+
+        metrics = self.scrape()
+        self.assertIn('books_requests_total{view="BookViewSet",action="list"} 1\n', metrics)
+        self.assertIn('books_request_duration_seconds_count{view="BookViewSet",action="retrieve"} 1\n', metrics)
+        self.assertIn('books_request_duration_seconds_bucket{view="BookViewSet",action="list",le="+Inf"} 1\n',
+                      metrics)
+        self.assertIn('books_serialization_total{view="BookViewSet",action="list"} 1\n', metrics)
+        self.assertIn('books_set_rating_total{view="UserBookRelationView",action="partial_update"} 1\n', metrics)
+        self.assertIn('books_set_rating_total{view="BookViewSet",action="list"} 0\n', metrics)
+        self.assertNotIn('books_db_queries_total{view="BookViewSet",action="list"} 0\n', metrics)
+
+    def test_workers(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('book-list'))
+            other = registry.collect()[('BookViewSet', 'list')]
+            Path(directory, '1.json').write_text(json.dumps([['BookViewSet', 'list', other]]))
+            self.assertIn('books_requests_total{view="BookViewSet",action="list"} 2\n', self.scrape())
+
+    def test_reused_pid(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('book-list'))
+            self.client.get(reverse('book-list'))
+            registry.flush()
+            # A new worker with the same pid starts from zero.
+            registry.reset()
+            self.client.get(reverse('book-list'))
+            self.assertIn('books_requests_total{view="BookViewSet",action="list"} 3\n', self.scrape())
+            self.assertEqual(2, len(list(Path(directory).glob('*.json'))))
+
+    def test_flush_at_exit(self):
+        script = ('import django; django.setup(); from store.metrics import registry, RequestTimings; '
+                  'timings = RequestTimings(); timings.requests = 1; '
+                  'registry.observe("BookViewSet", "list", timings)')
+        with tempfile.TemporaryDirectory() as directory:
+            subprocess.run([sys.executable, '-c', script], check=True, env=dict(os.environ, METRICS_DIR=directory))
+            with override_settings(METRICS_DIR=directory):
+                self.assertEqual([1], [values[0] for values in registry.collect().values()])
+
+    def test_no_empty_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            registry.flush()
+            self.assertEqual([], list(Path(directory).iterdir()))
+
+    def test_clear(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            registry.observe('BookViewSet', 'list', RequestTimings())
+            registry.flush()
+            call_command('clear_metrics', stdout=io.StringIO())
+            self.assertEqual([], list(Path(directory).iterdir()))
+
+    def test_remote(self):
+        self.assertEqual(404, self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code)
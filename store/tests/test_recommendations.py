@@ -0,0 +1,62 @@
+import importlib.util
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.models import Book, UserBookRelation, BookSimilarity
+from store.recommendations import build_similarities
+
+
+@skipUnless(importlib.util.find_spec('scipy'), 'requires numpy and scipy')
+class BuildSimilaritiesTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.user2 = User.objects.create_user(username='testuser2')
+        self.user3 = User.objects.create_user(username='testuser3')
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.book_2 = Book.objects.create(name='Test Book 2', price=55, author='Author 1')
+        self.book_3 = Book.objects.create(name='Test Book 3', price=55, author='Author 2')
+        self.book_4 = Book.objects.create(name='Test Book 4', price=55, author='Author 2')
+        UserBookRelation.objects.create(book=self.book_1, user=self.user, like=True)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user, like=True)
+        UserBookRelation.objects.create(book=self.book_1, user=self.user2, like=True)
+        UserBookRelation.objects.create(book=self.book_2, user=self.user2, like=True)
+        UserBookRelation.objects.create(book=self.book_3, user=self.user2, like=True)
+        UserBookRelation.objects.create(book=self.book_4, user=self.user3, like=True)
+
+    def test_build(self):
+        self.assertEqual(4, build_similarities(top_k=1))
+        neighbours = dict(BookSimilarity.objects.values_list('book_id', 'similar_id'))
+        self.assertEqual([self.book_1.id, self.book_2.id, self.book_3.id], sorted(neighbours))
+        self.assertEqual(self.book_2.id, neighbours[self.book_1.id])
+        self.assertEqual(self.book_1.id, neighbours[self.book_2.id])
+
+    def test_similar(self):
+        build_similarities()
+        response = self.client.get(reverse('book-similar', args=(self.book_1.id,)), data={'fields': 'id'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'id': self.book_2.id}, {'id': self.book_3.id}], response.data)
+
+    def test_incremental(self):
+        build_similarities()
+        UserBookRelation.objects.create(book=self.book_4, user=self.user, like=True)
+        self.assertEqual(3, build_similarities(incremental=True))
+        self.assertTrue(BookSimilarity.objects.filter(book=self.book_4, similar=self.book_1).exists())
+        self.assertTrue(BookSimilarity.objects.filter(book=self.book_3, similar=self.book_1).exists())
+        self.assertEqual(10, BookSimilarity.objects.count())
+
+    def test_incremental_deleted(self):
+        build_similarities()
+        UserBookRelation.objects.filter(book=self.book_3).get().delete()
+        self.user.delete()
+        self.assertEqual(3, build_similarities(incremental=True))
+        self.assertFalse(BookSimilarity.objects.filter(book=self.book_3).exists())
+        self.assertFalse(BookSimilarity.objects.filter(similar=self.book_3).exists())
+        self.assertEqual(2, BookSimilarity.objects.count())
+
+    def test_similar_missing_book(self):
+        response = self.client.get(reverse('book-similar', args=(self.book_4.id + 100,)))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
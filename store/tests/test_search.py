@@ -0,0 +1,71 @@
+import io
+import tempfile
+import threading
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from store.models import Book
+from store.search import get_index, tokenize, SearchIndex
+
+
+class SearchIndexTestCase(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(BOOK_SEARCH_BACKEND='index',
+                                     BOOK_SEARCH_INDEX=Path(directory.name) / 'book_search.idx')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.book_1 = Book.objects.create(name='Test Book 1', price=25, author='Author 1')
+        self.book_2 = Book.objects.create(name='Test Book 2', price=55, author='Author 5')
+        self.book_3 = Book.objects.create(name='Crème brûlée', price=55, author='Author 2')
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.url = reverse('book-list')
+
+    def search(self, term):
+        response = self.client.get(self.url, data={'search': term, 'fields': 'id'})
+        return sorted(book['id'] for book in response.data)
+
+    def test_tokenize(self):
+        self.assertEqual(['creme', 'brulee', 'a', 'b'], tokenize('Crème BRÛLÉE, a-b'))
+
+    def test_search(self):
+        self.assertEqual([self.book_1.id], self.search('Author 1'))
+        self.assertEqual([self.book_2.id], self.search('test, author 5'))
+        self.assertEqual([self.book_3.id], self.search('creme'))
+        self.assertEqual([self.book_1.id, self.book_2.id], self.search('boo'))
+        self.assertEqual([], self.search('ook'))
+
+    def test_incremental(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book_4 = Book.objects.create(name='Other Book', price=10, author='Someone')
+            self.book_1.name = 'Renamed'
+            self.book_1.save()
+            self.book_2.delete()
+        self.assertEqual([book_4.id], self.search('book'))
+        self.assertEqual([self.book_1.id], self.search('renamed'))
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual([book_4.id], self.search('book'))
+        self.assertEqual(0, get_index().log_path.stat().st_size)
+
+    def test_concurrent_refresh(self):
+        index = get_index()
+        for book_id in range(100, 300):
+            index.record(book_id, ['concurrent'])
+        threads = [threading.Thread(target=index.search, args=(['concurrent'],)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(index.log_path.stat().st_size, index.log_offset)
+        self.assertEqual(200, len(SearchIndex(index.path).search(['concurrent'])))
+
+    def test_missing_index_falls_back(self):
+        get_index().path.unlink()
+        self.assertEqual([self.book_1.id, self.book_2.id], self.search('ook'))
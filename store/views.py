@@ -1,43 +1,176 @@
-from django.db.models import Count, Case, When, Avg, F
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Case, When, Avg, F, Min, Max, Value, DecimalField
+from django.db.models.functions import Floor
+from django.http import HttpResponse, Http404
 from django.shortcuts import render
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
+from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.filters import OrderingFilter
 from rest_framework.mixins import UpdateModelMixin
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from store.authentication import create_token
+from store.cache import book_cache, get_version, create_version, cached_price_facets
+from store import metrics
 from store.models import Book, UserBookRelation
 from store.permissions import IsOwnerOrStaffOrReadOnly
-from store.serializers import BookSerializer, UserBookRelationSerializer
+from store.search import BookSearchFilter
+from store.serializers import BookSerializer, UserBookRelationSerializer, get_requested_fields
+
+
+BOOK_FIELD_COLUMNS = {
+    'id': ('id',),
+    'name': ('name',),
+    'price': ('price',),
+    'author': ('author',),
+    'rating': ('rating',),
+    'owner_name': ('owner__username',),
+}
+
+
+# Prices have two decimal places, so smaller buckets would have equal bounds.
+MIN_BUCKET_SIZE = Decimal('0.01')
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(metrics.InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all().annotate(
         annotated_likes=Count(Case(When(userbookrelation__like=True, then=1)))
     ).select_related('owner').prefetch_related('readers').order_by('id')
     serializer_class = BookSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, OrderingFilter]
     permission_classes = [IsOwnerOrStaffOrReadOnly]
-    filterset_fields = ['price']
+    filterset_fields = {'price': ['exact', 'gte', 'lte', 'gt', 'lt', 'in', 'range']}
     search_fields = ['name', 'author']
     ordering_fields = ['author', 'price']
 
+    def get_queryset(self):
+        fields = get_requested_fields(self.request, BookSerializer.Meta.fields)
+        if len(fields) == len(BookSerializer.Meta.fields):
+            return super().get_queryset()
+
+        queryset = Book.objects.all()
+        if 'annotated_likes' in fields:
+            queryset = queryset.annotate(annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))))
+        if 'owner_name' in fields:
+            queryset = queryset.select_related('owner')
+        if 'readers' in fields:
+            queryset = queryset.prefetch_related('readers')
+        columns = [column for name in fields for column in BOOK_FIELD_COLUMNS.get(name, ())]
+        return queryset.only('id', *columns).order_by('id')
+
     def perform_create(self, serializer):
         serializer.validated_data['owner'] = self.request.user
         serializer.save()
 
+    def retrieve(self, request, *args, **kwargs):
+        params = request.query_params
+        if not book_cache.enabled or 'fields' in params or 'exclude' in params or not kwargs['pk'].isdigit():
+            return super().retrieve(request, *args, **kwargs)
+
+        book_id = int(kwargs['pk'])
+        data = book_cache.get(book_id)
+        if data is None:
+            # The version has to be read before the book, so a change in between makes the entry stale.
+            version = get_version(book_id)
+            response = super().retrieve(request, *args, **kwargs)
+            if version is None:
+                version = create_version(book_id)
+                if version != 0:
+                    return response
+            book_cache.put(book_id, version, response.data)
+            return response
+        return Response(data)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        self.get_object()
+        books = self.get_queryset().filter(similar_to__book_id=pk).order_by('-similar_to__score')
+        return Response(self.get_serializer(books, many=True).data)
+
+    @action(detail=False)
+    def price_facets(self, request):
+        try:
+            size = Decimal(request.query_params.get('bucket_size', '10'))
+        except InvalidOperation:
+            size = None
+        if size is None or not size.is_finite() or size < MIN_BUCKET_SIZE:
+            raise ValidationError({'bucket_size': f'A number of at least {MIN_BUCKET_SIZE} is required.'})
+        return Response(cached_price_facets(request.query_params, lambda: self.get_price_facets(size)))
 
-class UserBookRelationView(UpdateModelMixin, GenericViewSet):
+    def get_price_facets(self, size):
+        books = self.filter_queryset(Book.objects.all()).order_by()
+        buckets = books.annotate(
+            bucket=Floor(F('price') / Value(size, output_field=DecimalField()))
+        ).values('bucket').annotate(
+            count=Count('id'), min_price=Min('price'), max_price=Max('price')
+        ).order_by('bucket')
+
+        def price(value):
+            return str(Decimal(value).quantize(MIN_BUCKET_SIZE))
+
+        buckets = list(buckets[:settings.PRICE_FACETS_MAX_BUCKETS + 1])
+        if len(buckets) > settings.PRICE_FACETS_MAX_BUCKETS:
+            raise ValidationError({'bucket_size': f'More than {settings.PRICE_FACETS_MAX_BUCKETS} buckets, '
+                                                  f'use a larger bucket_size.'})
+        return {
+            'min': price(buckets[0]['min_price']) if buckets else None,
+            'max': price(max(bucket['max_price'] for bucket in buckets)) if buckets else None,
+            'buckets': [{'low': price(bucket['bucket'] * size), 'high': price((bucket['bucket'] + 1) * size),
+                         'count': bucket['count']} for bucket in buckets],
+        }
+
+
+class UserBookRelationView(metrics.InstrumentedViewMixin, UpdateModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated]
     queryset = UserBookRelation.objects.all()
     serializer_class = UserBookRelationSerializer
     lookup_field = 'book'
 
     def get_object(self):
-        obj, _ = UserBookRelation.objects.get_or_create(user=self.request.user, book_id=self.kwargs['book'])
-        return obj
+        if settings.PERSIST_EMPTY_RELATIONS:
+            obj, _ = UserBookRelation.objects.get_or_create(user=self.request.user, book_id=self.kwargs['book'])
+            return obj
+        obj = UserBookRelation.objects.filter(user=self.request.user, book_id=self.kwargs['book']).first()
+        return obj or UserBookRelation(user=self.request.user, book_id=self.kwargs['book'])
+
+    def perform_update(self, serializer):
+        relation = serializer.instance
+        if relation.pk is None:
+            for attr, value in serializer.validated_data.items():
+                setattr(relation, attr, value)
+            if relation.is_empty:
+                return
+        with transaction.atomic():
+            # Saving first writes the events that clear the relation.
+            serializer.save()
+            if not settings.PERSIST_EMPTY_RELATIONS and relation.is_empty:
+                relation.delete()
+
+
+class ObtainTokenView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request):
+        serializer = AuthTokenSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        return Response({'token': create_token(serializer.validated_data['user'])})
 
 
 def auth(request):
     return render(request, 'oauth.html')
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')